@@ -0,0 +1,156 @@
+"""Headless batch mode: run queries as concurrent conversations.
+
+Usage:
+    uv run batch.py [QUERIES.jsonl|-] [--concurrency 4] [--output RESULTS.jsonl]
+
+Every input line is a JSON object `{"id": ..., "query": "..."}` (or just a
+JSON string). Up to `--concurrency` conversations run at once, each with its
+own message history, over one shared model client and the MCP servers of
+MCP_SERVERS_CONFIG, launched once. Every conversation loops through tool
+use like the interactive client.
+
+One JSON line per query is written (to stdout by default) as soon as it
+completes: `id`, `response`, `latency`, `ttft`, `model_calls`,
+`tool_calls`, `tool_errors`, `input_tokens`, `output_tokens`,
+`cache_read_input_tokens`, `cache_creation_input_tokens`,
+`history_saved_bytes`, `history_saved_tokens` (left out of the requests
+by history compaction, summed over the model calls) and `error`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from client import (ClaudeClient, ToolRegistry, call_tool, launch_stdio_clients, load_servers_config,
+                    register_local_tools)
+from history import ConversationHistory
+from telemetry import tracer
+
+
+async def run_conversation(claude_client, tool_registry, query) -> dict:
+    messages = ConversationHistory.from_env()
+    messages.append({"role": "user", "content": query})
+    usage = dict()
+    model_calls = tool_calls = tool_errors = 0
+    text = []
+
+    while True:
+        tool_tasks = []
+
+        def start_tool(tool_use):
+            tool_tasks.append(asyncio.create_task(call_tool(tool_registry, tool_use)))
+
+        try:
+            response = await claude_client.process_query(tool_registry, on_tool_use=start_tool,
+                                                         messages=messages, usage=usage)
+        except BaseException:
+            for tool_task in tool_tasks:
+                tool_task.cancel()
+            raise
+        model_calls += 1
+        text.extend(block.text for block in response if block.type == "text")
+
+        if not tool_tasks:
+            break
+
+        tool_results = await asyncio.gather(*tool_tasks)
+        tool_calls += len(tool_results)
+        tool_errors += sum(1 for tool_result in tool_results if tool_result.get("is_error"))
+        messages.append({"role": "assistant", "content": response})
+        messages.append({"role": "user", "content": list(tool_results)})
+
+    return {
+        "response": "".join(text),
+        "ttft": round(usage["ttft"], 4) if "ttft" in usage else None,
+        "model_calls": model_calls,
+        "tool_calls": tool_calls,
+        "tool_errors": tool_errors,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+        "history_saved_bytes": usage.get("history_saved_bytes", 0),
+        "history_saved_tokens": usage.get("history_saved_tokens", 0),
+    }
+
+
+def read_queries(source) -> list:
+    lines = sys.stdin.readlines() if source == "-" else open(source).readlines()
+    queries = []
+    for index, line in enumerate(line for line in lines if line.strip()):
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {"query": item}
+        item.setdefault("id", index)
+        queries.append(item)
+    return queries
+
+
+async def run_batch(queries, concurrency, output) -> dict:
+    claude_client = ClaudeClient()
+    tool_registry = ToolRegistry()
+    register_local_tools(tool_registry)
+    stdio_clients = []
+
+    servers_config_path = os.environ.get("MCP_SERVERS_CONFIG")
+    if servers_config_path:
+        targets = [target for target, _ in load_servers_config(servers_config_path).values()]
+        for result in await launch_stdio_clients(targets, tool_registry.on_tools_changed):
+            if isinstance(result, Exception):
+                print(f"Error occurred: {result}", file=sys.stderr)
+                continue
+            new_stdio_client, new_tools = result
+            tool_registry.register(new_stdio_client, new_tools)
+            stdio_clients.append(new_stdio_client)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def run_one(item):
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                # Every conversation is a trace of its own
+                with tracer.span("query"):
+                    result = await run_conversation(claude_client, tool_registry, item["query"])
+                result["error"] = None
+            except Exception as e:
+                failed += 1
+                result = {"error": str(e)}
+            result = {"id": item["id"], "latency": round(time.perf_counter() - started, 4), **result}
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_one(item) for item in queries))
+    finally:
+        tracer.export()
+        for client in stdio_clients:
+            await client.cleanup()
+
+    return {"queries": len(queries), "failed": failed, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", nargs="?", default="-", help="JSONL file, - for stdin")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="JSONL file for the results (default: stdout)")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = asyncio.run(run_batch(queries, args.concurrency, output))
+    finally:
+        if args.output:
+            output.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
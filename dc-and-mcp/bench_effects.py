@@ -0,0 +1,181 @@
+"""Benchmark of the trampolined effect runtime.
+
+Usage:
+    uv run bench_effects.py [--iterations 1000000] [--legacy 20000]
+    uv run bench_effects.py --replay TRACE [--repeat 100]
+
+Runs `count` from ../delimited-continuation-simple-example/example.py and
+`replbody` from client.py for `--iterations` loop iterations. Their handlers
+do nothing, so only the runtime is measured. For every tenth of the run it
+reports the time per step and the Python stack depth at the handler, and
+both should stay flat.
+
+`--legacy N` runs the same loops in their earlier recursive `yield from`
+form for comparison; `send()` cost grows with every iteration, and deep
+enough runs fail with RecursionError.
+
+`--replay TRACE` measures the throughput of the client logic instead: it
+replays a session recorded with CLIENT_EFFECT_TRACE `--repeat` times.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+from client import purefunction, replay, replbody
+from effects import IO, arun
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE = os.path.join(HERE, "..", "delimited-continuation-simple-example", "example.py")
+
+
+def load_example():
+    spec = importlib.util.spec_from_file_location("example", EXAMPLE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def stack_depth() -> int:
+    frame, depth = sys._getframe(), 0
+    while frame:
+        frame, depth = frame.f_back, depth + 1
+    return depth
+
+
+class Probe:
+    """Counts handled effects and samples step time and stack depth every `every` of them."""
+
+    def __init__(self, every: int):
+        self.every = every
+        self.steps = 0
+        self.last = time.perf_counter()
+        self.samples = []
+
+    def __call__(self):
+        self.steps += 1
+        if self.steps % self.every == 0:
+            now = time.perf_counter()
+            self.samples.append(((now - self.last) / self.every * 1e6, stack_depth()))
+            self.last = now
+
+
+def report(name: str, iterations: int, seconds: float, probe: Probe) -> None:
+    print(f"\n{name}: {iterations} iterations, {probe.steps} effects in {seconds:.2f}s")
+    for index, (step_us, depth) in enumerate(probe.samples, 1):
+        print(f"  {index * probe.every:>9} effects: {step_us:7.3f} us/effect, stack depth {depth}")
+
+
+def bench_count(example, iterations: int) -> None:
+    probe = Probe(max(iterations // 10, 1))
+
+    def handle(io):
+        probe()
+        if io["io_type"] == "read":
+            return str(iterations - 1)
+
+    started = time.perf_counter()
+    example.run(example.count(0), handle)
+    report("count (trampolined)", iterations, time.perf_counter() - started, probe)
+
+
+def bench_replbody(iterations: int) -> None:
+    # Every iteration reads an empty query (skipped) and continues; the last one quits
+    probe = Probe(max(iterations // 10, 1))
+    reads = 0
+
+    async def handle(io):
+        nonlocal reads
+        probe()
+        if io["io_type"] == "read":
+            reads += 1
+            return "/quit" if reads > iterations else ""
+
+    started = time.perf_counter()
+    asyncio.run(arun(replbody(), handle))
+    report("replbody (trampolined)", iterations, time.perf_counter() - started, probe)
+
+
+def legacy_count(x, n):
+    if x <= n:
+        yield from IO("print", x)
+        yield from legacy_count(x + 1, n)
+
+
+def legacy_replbody():
+    q = yield from IO("read", "Specify query:")
+    if purefunction(q)["io_type"] == "quit":
+        return None
+    yield from legacy_replbody()
+
+
+def drive_legacy(computation, handle) -> None:
+    value = None
+    while True:
+        try:
+            io = computation.send(value)
+        except StopIteration:
+            return
+        value = handle(io)
+
+
+def bench_legacy(iterations: int) -> None:
+    probe = Probe(max(iterations // 10, 1))
+    started = time.perf_counter()
+    try:
+        drive_legacy(legacy_count(0, iterations - 1), lambda io: probe())
+    except RecursionError as e:
+        print(f"\ncount (recursive): RecursionError after {probe.steps} effects: {e}")
+    else:
+        report("count (recursive)", iterations, time.perf_counter() - started, probe)
+
+    probe = Probe(max(iterations // 10, 1))
+
+    def handle(io):
+        probe()
+        return "/quit" if probe.steps > iterations else ""
+
+    started = time.perf_counter()
+    try:
+        drive_legacy(legacy_replbody(), handle)
+    except RecursionError as e:
+        print(f"\nreplbody (recursive): RecursionError after {probe.steps} effects: {e}")
+    else:
+        report("replbody (recursive)", iterations, time.perf_counter() - started, probe)
+
+
+def bench_replay(trace: str, repeat: int) -> None:
+    effects = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        effects += asyncio.run(replay(trace))["effects"]
+    elapsed = time.perf_counter() - started
+    print(f"replay of {trace}: {repeat} sessions, {effects} effects in {elapsed:.2f}s, "
+          f"{effects / elapsed:.1f} effects/s, {repeat / elapsed:.1f} sessions/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--legacy", type=int, default=0, metavar="N",
+                        help="also run N iterations of the recursive versions")
+    parser.add_argument("--replay", metavar="TRACE", help="replay a recorded session instead")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.replay:
+        bench_replay(args.replay, args.repeat)
+        return
+
+    bench_count(load_example(), args.iterations)
+    bench_replbody(args.iterations)
+    if args.legacy:
+        bench_legacy(args.legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Cold start of a stdio MCP server and of the clients.
+
+Usage:
+    uv run bench_startup.py [CWD] [SERVER.py] [--runs 10] [--top 12]
+                            [--client FILE ...] [--output FILE]
+                            [--compare BASELINE] [--max-regression PERCENT]
+
+Defaults to `../weather weather.py`. The server is spawned `--runs` times
+and the time from spawn to the `initialize` response and to the
+`list_tools` response is measured, as `/launch_stdio` waits for both. Once
+more it runs with `-X importtime` (PYTHONPROFILEIMPORTTIME) to report total
+import time and its `--top` direct imports.
+
+For every `--client` (default: client.py and ../mcp-example-client/client.py)
+it reports the wall time of importing it in a fresh interpreter and its
+import breakdown.
+
+With `--compare` the run is checked against saved results; it exits with
+status 1 when a p50 got more than `--max-regression` percent (default 20)
+slower.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CLIENTS = [os.path.join(HERE, "client.py"), os.path.join(HERE, "..", "mcp-example-client", "client.py")]
+
+
+def summary(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "min_ms": round(ordered[0] * 1000, 1),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+    }
+
+
+def parse_importtime(lines: list[str], top: int, module: str | None = None) -> dict:
+    """Total import time and the slowest direct imports (cumulative, ms) in a `-X importtime` log.
+
+    Direct imports of a script are logged at the top level, those of an
+    imported `module` one level below it, before the module itself.
+    """
+    total = 0
+    direct: list[tuple[str, int]] = []
+    children: list[tuple[str, int]] = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        nesting = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name, cumulative = name.strip(), int(cumulative_us)
+        if nesting == 1:
+            children.append((name, cumulative))
+        elif nesting == 0:
+            total += cumulative
+            if module is None:
+                direct.append((name, cumulative))
+            elif name == module:
+                direct = children
+            children = []
+
+    slowest = sorted(direct, key=lambda entry: entry[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total / 1000, 1),
+        "top": {name: round(cumulative / 1000, 1) for name, cumulative in slowest},
+    }
+
+
+async def start_server(cwd: str, script: str, env: dict[str, str], errlog) -> tuple[float, float]:
+    params = StdioServerParameters(command=sys.executable, args=[script], cwd=cwd, env=env)
+    started = time.perf_counter()
+    async with stdio_client(params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter() - started
+            await session.list_tools()
+            listed = time.perf_counter() - started
+    return initialized, listed
+
+
+async def measure_server(cwd: str, script: str, runs: int, top: int) -> dict:
+    env = dict(os.environ)
+    initialize, list_tools = [], []
+    with open(os.devnull, "w") as devnull:
+        for _ in range(runs):
+            initialized, listed = await start_server(cwd, script, env, devnull)
+            initialize.append(initialized)
+            list_tools.append(listed)
+
+    with tempfile.TemporaryFile("w+") as log:
+        await start_server(cwd, script, {**env, "PYTHONPROFILEIMPORTTIME": "1"}, log)
+        log.seek(0)
+        imports = parse_importtime(log.readlines(), top)
+
+    return {"initialize": summary(initialize), "list_tools": summary(list_tools), "imports": imports}
+
+
+def measure_client(path: str, runs: int, top: int) -> dict:
+    directory, module = os.path.split(os.path.abspath(path))
+    code = f"import sys; sys.path.insert(0, {directory!r}); import {os.path.splitext(module)[0]}"
+
+    walls = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=directory, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        walls.append(time.perf_counter() - started)
+
+    profile = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory,
+                             check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = parse_importtime(profile.stderr.splitlines(), top, os.path.splitext(module)[0])
+    return {"import": summary(walls), "imports": imports}
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the p50 changes against `baseline`; False when one regressed too much."""
+    ok = True
+    print("\nvs baseline:")
+    rows = [("server initialize", ("server", "initialize")), ("server list_tools", ("server", "list_tools"))]
+    rows += [(f"import {name}", ("clients", name, "import")) for name in results.get("clients", {})]
+    for label, path in rows:
+        old, new = baseline, results
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if not old or not new:
+            continue
+        change = (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        regressed = change > max_regression
+        ok = ok and not regressed
+        print(f"  {label:>28}: {old['p50_ms']} -> {new['p50_ms']} ms ({change:+.1f}%){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cwd", nargs="?", default=os.path.join(HERE, "..", "weather"))
+    parser.add_argument("server", nargs="?", default="weather.py")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--client", action="append", help="client module to import (repeatable)")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--max-regression", type=float, default=20.0, metavar="PERCENT")
+    args = parser.parse_args()
+
+    results = {
+        "server": asyncio.run(measure_server(args.cwd, args.server, args.runs, args.top)),
+        "clients": {
+            os.path.relpath(path, HERE): measure_client(path, args.runs, args.top)
+            for path in (args.client or DEFAULT_CLIENTS)
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(results, json.load(f), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
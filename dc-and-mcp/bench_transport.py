@@ -0,0 +1,90 @@
+"""Compare the stdio and in-process transports of a Python FastMCP server.
+
+Usage:
+    uv run bench_transport.py [CWD] [MODULE.py] [--sessions N] [--calls N]
+                              [--tool NAME --arguments JSON] [--output FILE]
+
+Defaults to `../weather weather.py`. For each transport it measures session
+startup (start, `initialize` and `list_tools`) and the round trip of
+sequential calls: `list_tools` unless `--tool` is given. The in-process
+numbers are split into the first session, which imports the server module,
+and the following ones.
+
+The server's dependencies have to be installed in this environment.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from client import INPROCESS, StdioMCPClient
+
+
+def summary(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3),
+    }
+
+
+async def measure(target: tuple, sessions: int, calls: int, tool: str | None, arguments: dict) -> dict:
+    startups = []
+    latencies = []
+    for _ in range(sessions):
+        client = StdioMCPClient()
+        started = time.perf_counter()
+        await client.start(*target)
+        startups.append(time.perf_counter() - started)
+
+        try:
+            for _ in range(calls):
+                started = time.perf_counter()
+                if tool:
+                    await client.process_tool(tool, arguments)
+                else:
+                    await client.session.list_tools()
+                latencies.append(time.perf_counter() - started)
+        finally:
+            await client.cleanup()
+
+    return {
+        "startup_first_ms": round(startups[0] * 1000, 1),
+        "startup": summary(startups[1:] or startups),
+        "call": summary(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    arguments = json.loads(args.arguments)
+    return {
+        "stdio": await measure((args.cwd, sys.executable, (args.module,)),
+                               args.sessions, args.calls, args.tool, arguments),
+        INPROCESS: await measure((args.cwd, INPROCESS, (args.module,)),
+                                 args.sessions, args.calls, args.tool, arguments),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cwd", nargs="?", default="../weather")
+    parser.add_argument("module", nargs="?", default="weather.py")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--tool", help="tool to call instead of list_tools")
+    parser.add_argument("--arguments", default="{}", help="JSON arguments of --tool")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
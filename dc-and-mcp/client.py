@@ -2,93 +2,820 @@ import asyncio
 from typing import Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
 
-from anthropic import Anthropic
 from dotenv import load_dotenv
 
+from effects import IO, Handlers, Recorder, Replayer, ReplayMismatch, arun, effect
+from history import ConversationHistory
+from result_store import ResultStore
+from telemetry import tracer
+
+import anyio
+import importlib.util
+from collections import OrderedDict
+import os
 import re
+import sys
 import json
+import time
 
 load_dotenv()  # load environment variables from .env
 
+# `cmd` of a launch target which runs a Python FastMCP server inside this process
+INPROCESS = "inprocess"
+
+
+def load_fastmcp_server(cwd, module_spec):
+    """Import `path/to/server.py[:attr]` (relative to `cwd`) and return its FastMCP instance (`mcp` by default)."""
+    path, _, attr = module_spec.partition(":")
+    path = os.path.abspath(os.path.join(cwd, path))
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    module = sys.modules.get(name)
+    if module is None or getattr(module, "__file__", None) != path:
+        # The server's own imports are relative to its directory
+        if os.path.dirname(path) not in sys.path:
+            sys.path.insert(0, os.path.dirname(path))
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+
+    return getattr(module, attr or "mcp")
+
+
+# Client side cache of tool results, LRU bounded by entry count and by bytes
+class ToolResultCache:
+    def __init__(self, tools=None, default_ttl=300.0, max_entries=256, max_bytes=4 * 1024 * 1024):
+        # Only idempotent tools opt in: tool name -> TTL in seconds
+        self.tools = dict(tools or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls):
+        """CLIENT_TOOL_CACHE="get_forecast=600,get_alerts" opts tools in (`=TTL` in seconds is optional)."""
+        default_ttl = float(os.environ.get("CLIENT_TOOL_CACHE_TTL", 300))
+        tools = dict()
+        for item in os.environ.get("CLIENT_TOOL_CACHE", "").split(","):
+            name, _, ttl = item.strip().partition("=")
+            if name:
+                tools[name] = float(ttl) if ttl else default_ttl
+        return cls(
+            tools,
+            default_ttl,
+            int(os.environ.get("CLIENT_TOOL_CACHE_MAX_ENTRIES", 256)),
+            int(os.environ.get("CLIENT_TOOL_CACHE_MAX_BYTES", 4 * 1024 * 1024)),
+        )
+
+    def cacheable(self, tool_name) -> bool:
+        return tool_name in self.tools
+
+    @staticmethod
+    def key(server, tool_name, tool_args):
+        # Canonical arguments: the same call with reordered keys is the same entry
+        return server, tool_name, json.dumps(tool_args, sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        expires_at, size, content = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return content
+
+    def put(self, key, content):
+        size = sum(len(item.model_dump_json()) for item in content)
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + self.tools[key[1]], size, content)
+        self.bytes += size
+
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self, tool_name=None):
+        for key in [key for key in self.entries if tool_name is None or key[1] == tool_name]:
+            self._remove(key)
+
+    def report(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_ratio = self.stats["hits"] / lookups if lookups else 0.0
+        tools = ", ".join(f"{name} ({ttl:g}s)" for name, ttl in self.tools.items()) or "none (set CLIENT_TOOL_CACHE)"
+        return "\n".join([
+            f"cached tools: {tools}",
+            f"entries: {len(self.entries)}/{self.max_entries}, bytes: {self.bytes}/{self.max_bytes}",
+            f"hits: {self.stats['hits']}, misses: {self.stats['misses']}, hit ratio: {hit_ratio:.2f}",
+            f"expired: {self.stats['expired']}, evictions: {self.stats['evictions']}",
+        ])
+
+
+# Shared by all servers of the process, so repeats hit across conversations too
+tool_result_cache = ToolResultCache.from_env()
+
+# Oversized tool results, paged through by the model with its read_tool_result tool
+tool_result_store = ResultStore.from_env()
+
+
+def server_name(cmd, cmd_args) -> str:
+    """Short name of a server for metrics: its script or module, e.g. `weather` for `uv run weather.py`."""
+    for arg in reversed([cmd, *cmd_args]):
+        base = os.path.basename(arg.split(":")[0])
+        if base.endswith(".py"):
+            return base[:-3]
+    return os.path.basename(cmd)
+
+
 # Example MCP client from the guide
 class StdioMCPClient:
-    def __init__(self):
+    def __init__(self, on_tools_changed=None, max_concurrent_calls=4, result_cache=tool_result_cache,
+                 result_store=tool_result_store):
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
         self.tools = []
+        self.on_tools_changed = on_tools_changed
+        self._refresh_task = None
+        # Limits concurrent tool calls to this server
+        self.call_semaphore = asyncio.Semaphore(max_concurrent_calls)
+        # (cwd, cmd, cmd_args) the server was started with, used to respawn it
+        self.target = None
+        self.result_cache = result_cache
+        self.result_store = result_store
+        self._owner_task = None
+        self._stop = None
+        self.name = "unknown"
 
     async def connect_to_server(self, cwd, cmd, cmd_args=[]) -> list:
-        server_params = StdioServerParameters(
-            command=cmd,
-            args=cmd_args,
-            cwd=cwd,
-            env=None
+        self.name = server_name(cmd, cmd_args)
+        with tracer.span("connect", server=self.name):
+            if cmd == INPROCESS:
+                return await self.connect_in_process(cwd, cmd_args[0])
+
+            server_params = StdioServerParameters(
+                command=cmd,
+                args=cmd_args,
+                cwd=cwd,
+                env=None
+            )
+
+            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+            self.stdio, self.write = stdio_transport
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.write, message_handler=self.handle_message)
+            )
+
+            await asyncio.wait_for(self.session.initialize(), timeout=10)
+
+            response = await self.session.list_tools()
+            self.tools = response.tools
+            # print("\nConnected to server with tools:", [tool.name for tool in self.tools])
+            return self.tools
+
+    async def connect_in_process(self, cwd, module_spec) -> list:
+        """Run a Python FastMCP server in this process, connected through memory streams.
+
+        Same session API, but no process to spawn and no JSON over pipes.
+        Only for trusted servers whose dependencies are installed here.
+        """
+        server = load_fastmcp_server(cwd, module_spec)._mcp_server
+
+        client_streams, server_streams = await self.exit_stack.enter_async_context(create_client_server_memory_streams())
+        task_group = await self.exit_stack.enter_async_context(anyio.create_task_group())
+        task_group.start_soon(lambda: server.run(*server_streams, server.create_initialization_options()))
+        self.exit_stack.callback(task_group.cancel_scope.cancel)
+
+        self.session = await self.exit_stack.enter_async_context(
+            ClientSession(*client_streams, message_handler=self.handle_message)
         )
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-
         await asyncio.wait_for(self.session.initialize(), timeout=10)
 
         response = await self.session.list_tools()
         self.tools = response.tools
-        # print("\nConnected to server with tools:", [tool.name for tool in self.tools])
         return self.tools
 
-    def have_the_tool(self, tool_name) -> bool:
-        return tool_name in [tool.name for tool in self.tools]
+    async def start(self, cwd, cmd, cmd_args=[]) -> list:
+        """Like `connect_to_server`, but the session lives in a task of its own.
+
+        The stdio transport has to be closed by the task which opened it, so
+        clients started from gathered or background tasks (parallel launches,
+        the warm pool) use this and are closed by `cleanup` from anywhere.
+        """
+        self.target = (cwd, cmd, tuple(cmd_args))
+        self._stop = asyncio.Event()
+        connected = asyncio.get_running_loop().create_future()
+        self._owner_task = asyncio.create_task(self._own_session(connected))
+        try:
+            return await asyncio.shield(connected)
+        except asyncio.CancelledError:
+            # The owner task closes whatever it has opened so far
+            self._owner_task.cancel()
+            raise
+
+    async def _own_session(self, connected):
+        try:
+            cwd, cmd, cmd_args = self.target
+            tools = await self.connect_to_server(cwd, cmd, list(cmd_args))
+        except BaseException as e:
+            await self.exit_stack.aclose()
+            if not connected.done():
+                connected.set_exception(e)
+            return
+
+        connected.set_result(tools)
+        try:
+            await self._stop.wait()
+        finally:
+            await self.exit_stack.aclose()
+
+    async def is_alive(self, timeout=5) -> bool:
+        if self._owner_task is not None and self._owner_task.done():
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+        except Exception:
+            return False
+        return True
+
+    async def handle_message(self, message) -> None:
+        if isinstance(message, types.ServerNotification) and \
+                isinstance(message.root, types.ToolListChangedNotification):
+            # Delivered by the session's receive loop, so list_tools has to run outside of it
+            self._refresh_task = asyncio.create_task(self.refresh_tools())
+
+    async def refresh_tools(self) -> list:
+        response = await self.session.list_tools()
+        self.tools = response.tools
+        if self.on_tools_changed:
+            self.on_tools_changed(self, self.tools)
+        return self.tools
 
     async def process_tool(self, tool_name, tool_args) -> str:
-        result = await self.session.call_tool(tool_name, tool_args)
-        return result.content
+        cache = self.result_cache
+        if cache is not None and cache.cacheable(tool_name):
+            # A respawned server has the same target, so its cached results stay valid
+            key = cache.key(self.target or id(self), tool_name, tool_args)
+            content = cache.get(key)
+            if content is not None:
+                return content
+
+        with tracer.span("tool", tool=tool_name, server=self.name) as span:
+            async with self.call_semaphore:
+                result = await self.call_tool(tool_name, tool_args, span.traceparent)
+            if result.isError:
+                span.error = "tool_error"
+
+        content = result.content
+        store = self.result_store
+        if store is not None and store.oversized(content):
+            # Written in a thread, so a large result doesn't block the event loop
+            content = await asyncio.to_thread(store.spill, content)
+
+        if cache is not None and cache.cacheable(tool_name) and not result.isError:
+            cache.put(key, content)
+        return content
+
+    async def call_tool(self, tool_name, tool_args, traceparent) -> types.CallToolResult:
+        # session.call_tool, with the trace context in the _meta of the request
+        return await self.session.send_request(
+            types.ClientRequest(
+                types.CallToolRequest(
+                    method="tools/call",
+                    params=types.CallToolRequestParams(
+                        name=tool_name, arguments=tool_args, _meta={"traceparent": traceparent}
+                    ),
+                )
+            ),
+            types.CallToolResult,
+        )
 
     async def cleanup(self):
-        await self.exit_stack.aclose()
+        if self._owner_task is None:
+            await self.exit_stack.aclose()
+            return
+
+        self._stop.set()
+        await asyncio.wait([self._owner_task])
+        if not self._owner_task.cancelled():
+            self._owner_task.exception()  # a crashed server's error, its transport is gone already
+
+
+async def launch_stdio_clients(targets, on_tools_changed=None, pools={}) -> list:
+    """Start the (cwd, cmd, cmd_args) targets concurrently.
+
+    A target with a warm pool is claimed from it. Returns a (client, tools)
+    pair or the exception for every target, in order.
+    """
+    async def launch(target):
+        pool = pools.get(target)
+        if pool:
+            client = await pool.claim()
+            client.on_tools_changed = on_tools_changed
+            return client, client.tools
+
+        client = StdioMCPClient(on_tools_changed=on_tools_changed)
+        tools = await client.start(*target)
+        return client, tools
+
+    return await asyncio.gather(*(launch(target) for target in targets), return_exceptions=True)
+
+
+async def attach_stdio_clients(targets, stdio_clients, tool_registry, pools={}) -> list:
+    """Launch the targets concurrently, register their tools and add them to `stdio_clients`.
+
+    A server whose tools can't be registered (a name another server owns
+    already) is stopped again. Returns an error message for every target
+    which failed.
+    """
+    errors = []
+    for result in await launch_stdio_clients(targets, tool_registry.on_tools_changed, pools):
+        if isinstance(result, Exception):
+            errors.append(f"Error occurred: {result}")
+            continue
+
+        new_stdio_client, new_tools = result
+        try:
+            tool_registry.register(new_stdio_client, new_tools)
+        except Exception as e:
+            errors.append(f"Error occurred: {e}")
+            tool_registry.unregister(new_stdio_client)
+            await new_stdio_client.cleanup()
+            continue
+        stdio_clients.append(new_stdio_client)
+    return errors
+
+
+def parse_call_tool_args(text) -> tuple:
+    """Input of `/call_tool NAME ARG=VALUE ARG:number=VALUE ...`, and the arguments which can't be parsed."""
+    call_input = dict()
+    errors = []
+    for call_tool_arg in re.split(r'(?<!\\)\s+', (text or "").strip()):
+        if not call_tool_arg:
+            continue
+        call_tool_arg_match = re.search(r'([a-z_]+)(:number)?=(.+)', call_tool_arg)
+        if call_tool_arg_match:
+            input_name = call_tool_arg_match.group(1)
+            input_value = call_tool_arg_match.group(3)
+            if call_tool_arg_match.group(2):
+                call_input[input_name] = float(input_value) if "." in input_value else int(input_value)
+            else:
+                call_input[input_name] = input_value
+        else:
+            errors.append(f"\"{call_tool_arg}\" cannot be parsed for tool call input")
+    return call_input, errors
+
+
+def describe_tool(tool) -> str:
+    return "\n".join(["name:", tool.name, "description:", str(tool.description), "inputSchema:",
+                      json.dumps(tool.inputSchema, indent=2)])
+
+
+def parse_launch_targets(kind, text) -> tuple:
+    """Targets of `/launch_stdio CWD CMD [CMD_ARG...] ; CWD CMD [CMD_ARG...]` (or, with
+    `kind` INPROCESS, of `/launch_inprocess CWD MODULE.py[:ATTR]`).
+
+    Returns the (cwd, cmd, cmd_args) targets and the usage messages of the
+    ones which can't be parsed.
+    """
+    targets = []
+    errors = []
+    for launch_target in re.split(r'\s+;\s+', text.strip()):
+        launch_args = re.split(r'(?<!\\)\s+', launch_target)
+        if kind == INPROCESS:
+            # Trusted Python server in this process
+            if len(launch_args) != 2:
+                errors.append("/launch_inprocess command requires two additional arguments: /launch_inprocess CWD MODULE.py[:ATTR]")
+            else:
+                targets.append((launch_args[0], INPROCESS, (launch_args[1],)))
+        elif len(launch_args) < 2:
+            errors.append("/launch_stdio command requires at least two additional arguments for stdio: /launch_stdio CWD CMD [CMD_ARG...]")
+        else:
+            targets.append((launch_args[0], launch_args[1], tuple(launch_args[2:])))
+    return targets, errors
+
+
+def load_servers_config(path) -> dict:
+    """Read an `mcpServers` config: name -> {"command", "args", "cwd", "warm"},
+    or {"module", "cwd"} for a Python FastMCP server run in process.
+
+    Returns name -> ((cwd, cmd, cmd_args), warm pool size); a relative cwd is
+    relative to the config file.
+    """
+    with open(path) as f:
+        servers = json.load(f)["mcpServers"]
+
+    base = os.path.dirname(os.path.abspath(path))
+    config = dict()
+    for name, server in servers.items():
+        cwd = os.path.join(base, server.get("cwd", "."))
+        if "module" in server:
+            config[name] = ((cwd, INPROCESS, (server["module"],)), 0)
+        else:
+            config[name] = ((cwd, server["command"], tuple(server.get("args", []))), int(server.get("warm", 0)))
+    return config
+
+
+# Keeps `size` started and initialized clients of one server ready to be claimed
+class StdioServerPool:
+    def __init__(self, target, size=1, health_interval=15.0):
+        self.target = target
+        self.size = size
+        self.health_interval = health_interval
+        self.ready = []
+        self.starting = set()
+        self.respawned = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._maintain())
+
+    async def claim(self) -> StdioMCPClient:
+        """A warm client if there is one, otherwise a freshly started one."""
+        self._wakeup.set()
+        if self.ready:
+            return self.ready.pop(0)
+
+        client = StdioMCPClient()
+        await client.start(*self.target)
+        return client
+
+    async def _spawn(self):
+        client = StdioMCPClient()
+        self.starting.add(client)
+        try:
+            await client.start(*self.target)
+        except Exception as e:
+            print(f"\nWarm pool: cannot start {self.target[1]}: {e}")
+            return
+        finally:
+            self.starting.discard(client)
+        self.ready.append(client)
+
+    async def _maintain(self):
+        while True:
+            # Health check: crashed servers are dropped and respawned below
+            for client in list(self.ready):
+                if not await client.is_alive():
+                    self.ready.remove(client)
+                    self.respawned += 1
+                    await client.cleanup()
+
+            missing = self.size - len(self.ready)
+            if missing > 0:
+                await asyncio.gather(*(self._spawn() for _ in range(missing)))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for client in self.ready + list(self.starting):
+            await client.cleanup()
+        self.ready.clear()
+
+
+def register_local_tools(tool_registry):
+    """Tools the client answers itself: read_tool_result pages through oversized results."""
+    if tool_result_store.enabled:
+        tool_registry.register(tool_result_store, tool_result_store.tools)
+
+
+def tool_payload(tools) -> list:
+    """Tool definitions in the form of the Messages API."""
+    return [{
+        "name": tool.name,
+        "description": tool.description,
+        "input_schema": tool.inputSchema
+    } for tool in tools]
+
+
+# Tool name -> owning stdio client and its cached tool (name, description, inputSchema)
+class ToolRegistry:
+    def __init__(self):
+        self.tools = dict()
+        self.owners = dict()
+        self._payload = None
+
+    def payload(self) -> list:
+        """The tools converted for the model, rebuilt only after the registry changes."""
+        if self._payload is None:
+            self._payload = tool_payload(self.tools.values())
+        return self._payload
+
+    def __contains__(self, tool_name) -> bool:
+        return tool_name in self.tools
+
+    def get(self, tool_name):
+        return self.tools.get(tool_name)
+
+    def owner(self, tool_name) -> Optional[StdioMCPClient]:
+        return self.owners.get(tool_name)
+
+    def register(self, client, tools):
+        """Replace the tools of `client`; a name owned by another client is an error."""
+        for tool in tools:
+            owner = self.owners.get(tool.name)
+            if owner is not None and owner is not client:
+                raise Exception(f"Tool #{tool.name} is already exists")
+
+        self.unregister(client)
+        for tool in tools:
+            self.tools[tool.name] = tool
+            self.owners[tool.name] = client
+        self._payload = None
+
+    def unregister(self, client):
+        for tool_name in [name for name, owner in self.owners.items() if owner is client]:
+            del self.tools[tool_name]
+            del self.owners[tool_name]
+        self._payload = None
+
+    def on_tools_changed(self, client, tools):
+        try:
+            self.register(client, tools)
+        except Exception as e:
+            print(f"\nError: {str(e)}")
+
+
+async def call_tool(tool_registry, tool_use) -> dict:
+    """Run one tool_use block and return its tool_result block.
+
+    A failed call is reported to the model as an error result instead of
+    failing the whole turn.
+    """
+    found_stdio_client = tool_registry.owner(tool_use.name)
+    try:
+        if not found_stdio_client:
+            raise Exception(f"No suitable stdio client found for tool: #{tool_use.name}")
+        result = await found_stdio_client.process_tool(tool_use.name, tool_use.input)
+    except Exception as e:
+        return {"type": "tool_result", "tool_use_id": tool_use.id, "content": str(e), "is_error": True}
+    return {"type": "tool_result", "tool_use_id": tool_use.id, "content": result}
+
+
+# Measures how late the event loop wakes up a sleeping task, i.e. how long it was blocked
+class LoopLagMonitor:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, loop.time() - started - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def reset(self) -> float:
+        lag, self.max_lag = self.max_lag, 0.0
+        return lag
+
+
+def print_text(text):
+    print(text, end="", flush=True)
+
+
+def print_content(content, chunk_chars=8192):
+    """Print every part of a tool result, long text a chunk at a time."""
+    for index, part in enumerate(content):
+        print(f"[{index + 1}/{len(content)}] type: {part.type}")
+        if part.type == "text":
+            for start in range(0, len(part.text), chunk_chars):
+                print_text(part.text[start:start + chunk_chars])
+            print()
+        elif part.type == "image":
+            print(f"{part.mimeType}, {len(part.data)} base64 characters")
+        else:
+            print(part.resource.uri)
+        if part.annotations:
+            print(f"annotations: {part.annotations}")
+
+
+def print_timings(usage, lag_monitor):
+    """Timings and token counts of one model call, from the `usage` process_query filled in."""
+    if os.environ.get("CLIENT_TIMINGS"):
+        ttft = usage.get("ttft")
+        ttft = f"{ttft:.3f}s" if ttft is not None else "n/a"
+        tokens = ", ".join(f"{name}: {usage[name]}" for name in USAGE_TOKENS if name in usage) or "n/a"
+        saved = (f"{usage['history_saved_bytes']} bytes (~{usage['history_saved_tokens']} tokens)"
+                 if "history_saved_bytes" in usage else "n/a")
+        print(f"[time to first token: {ttft}, max event loop lag: {lag_monitor.reset() * 1000:.1f}ms, tokens: {tokens}, "
+              f"saved by history compaction: {saved}]")
+
+
+# Token counts of a model call, as process_query adds them to `usage`
+USAGE_TOKENS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+
+# /stats: (title, span name, label) rows of p50/p95 latency, one per label value
+STATS_GROUPS = [
+    ("query", "query", None),
+    ("model", "model", "model"),
+    ("first token", "ttft", "model"),
+    ("tool", "tool", "tool"),
+    ("server", "tool", "server"),
+    ("connect", "connect", "server"),
+]
+
+
+def cache_stats_report() -> str:
+    """/cache_stats: the tool result cache and the store of oversized results."""
+    return tool_result_cache.report() + "\n" + tool_result_store.report()
+
+
+def stats_report() -> str:
+    tracer.export()
+    return tracer.metrics.report(STATS_GROUPS)
+
+
+# Marks the end of a prompt prefix the API may cache
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+
+def with_cache_breakpoint(messages) -> list:
+    """Copy of `messages` whose last content block is a cache breakpoint.
+
+    The history itself is not changed: a request may only have a few
+    breakpoints, so only the latest prefix is marked each time.
+    """
+    if not messages:
+        return messages
+
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    else:
+        content = [block if isinstance(block, dict) else block.model_dump(exclude_none=True) for block in content]
+    content[-1] = dict(content[-1], cache_control=CACHE_BREAKPOINT)
+    return messages[:-1] + [dict(last, content=content)]
 
 
 # Simple dummy Claude client with no tools
 class ClaudeClient:
-    def __init__(self):
-        self.anthropic = Anthropic()
-        self.messages = []
+    def __init__(self, prompt_cache=None):
+        self._anthropic = None
+        self.model = "claude-3-5-sonnet-20241022"
+        # Compacted to a byte budget, see history.py
+        self.history = ConversationHistory.from_env()
+        # Mark the tool definitions and the conversation so far as cacheable prompt prefixes
+        self.prompt_cache = bool(os.environ.get("CLIENT_PROMPT_CACHE")) if prompt_cache is None else prompt_cache
+
+    @property
+    def anthropic(self):
+        # Created on the first chat turn: importing anthropic is a large part of the start up time
+        if self._anthropic is None:
+            from anthropic import AsyncAnthropic
+            self._anthropic = AsyncAnthropic()
+        return self._anthropic
 
     def append_to_messages(self, message):
-        self.messages.append(message)
+        self.history.append(message)
 
     def flush_messages(self):
-        self.messages.clear()
-
-    async def process_query(self, tools=[]) -> str:
-        available_tools = [{
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in tools]
-
-        response = self.anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            messages=self.messages,
-            tools=available_tools
-        )
-
+        self.history.clear()
+
+    async def process_query(self, tools=[], on_text=None, on_tool_use=None, messages=None, usage=None) -> str:
+        """Stream a response: text deltas go to `on_text` as they arrive and
+        every tool_use block to `on_tool_use` as soon as it is complete.
+
+        Concurrent conversations pass their own `messages` (a list, or a
+        ConversationHistory to send it compacted, instead of the shared
+        history). Token counts, the time to first token and the bytes
+        compaction saved are added to the `usage` dict; the client is shared
+        by concurrent conversations, so they are kept nowhere else.
+        `tools` is a ToolRegistry (its converted tools are cached) or a list.
+        """
+        available_tools = tools.payload() if isinstance(tools, ToolRegistry) else tool_payload(tools)
+        history = self.history if messages is None else messages
+        if isinstance(history, ConversationHistory):
+            messages = history.messages
+            # Bytes and tokens compaction left out of this request
+            saved = history.saved()
+        else:
+            saved = None
+
+        if self.prompt_cache:
+            if available_tools:
+                available_tools = available_tools[:-1] + [dict(available_tools[-1], cache_control=CACHE_BREAKPOINT)]
+            messages = with_cache_breakpoint(messages)
+
+        started = time.perf_counter()
+        with tracer.span("model", model=self.model):
+            async with self.anthropic.messages.stream(
+                model=self.model,
+                max_tokens=1000,
+                messages=messages,
+                tools=available_tools
+            ) as stream:
+                ttft = None
+                async for event in stream:
+                    if ttft is None and event.type in ("text", "input_json"):
+                        ttft = time.perf_counter() - started
+                        tracer.metrics.observe("ttft", ttft, {"model": self.model})
+                    if event.type == "text" and on_text:
+                        on_text(event.text)
+                    elif event.type == "content_block_stop" and event.content_block.type == "tool_use" and on_tool_use:
+                        on_tool_use(event.content_block)
+                response = await stream.get_final_message()
+
+        turn_usage = {
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+            # Prompt prefix tokens read from / written to the cache
+            "cache_read_input_tokens": response.usage.cache_read_input_tokens or 0,
+            "cache_creation_input_tokens": response.usage.cache_creation_input_tokens or 0,
+        }
+        if usage is not None:
+            for name, count in turn_usage.items():
+                usage[name] = usage.get(name, 0) + count
+            if "ttft" not in usage and ttft is not None:
+                usage["ttft"] = ttft
+            if saved is not None:
+                usage["history_saved_bytes"] = usage.get("history_saved_bytes", 0) + saved["bytes"]
+                usage["history_saved_tokens"] = usage.get("history_saved_tokens", 0) + saved["tokens"]
         return response.content
 
 
+async def watch_stdio_clients(stdio_clients, tool_registry, pools, interval=15.0):
+    """Health check of the attached servers: a crashed one is started again."""
+    while True:
+        await asyncio.sleep(interval)
+        for index, client in enumerate(list(stdio_clients)):
+            if client.target is None or await client.is_alive():
+                continue
+
+            print(f"\nServer {client.target[1]} is not responding, restarting it")
+            tool_registry.unregister(client)
+            await client.cleanup()
+            [launched] = await launch_stdio_clients([client.target], tool_registry.on_tools_changed, pools)
+            if isinstance(launched, Exception):
+                print(f"Error occurred: {launched}")
+                stdio_clients.remove(client)
+                continue
+            new_client, new_tools = launched
+            tool_registry.register(new_client, new_tools)
+            stdio_clients[stdio_clients.index(client)] = new_client
+
 
 async def main():
     claude_client = ClaudeClient()
-    all_tools = dict()
+    tool_registry = ToolRegistry()
+    register_local_tools(tool_registry)
     stdio_clients = []
+    lag_monitor = LoopLagMonitor()
+    lag_monitor.start()
+
+    # Servers with a "warm" count in MCP_SERVERS_CONFIG are pre-started in the background
+    servers_config_path = os.environ.get("MCP_SERVERS_CONFIG")
+    pools = dict()
+    if servers_config_path:
+        for target, warm in load_servers_config(servers_config_path).values():
+            if warm > 0:
+                pools[target] = StdioServerPool(target, warm)
+                pools[target].start()
+    watcher = asyncio.create_task(watch_stdio_clients(stdio_clients, tool_registry, pools))
 
     tools_pattern = r'^/(describe|generate|call)_tool\s+([a-z_]+)(\s+.+)?'
-    call_tool_arg_pattern = r'([a-z_]+)(:number)?=(.+)'
-    launch_stdio_pattern = r'^/launch_stdio\s(.+)'
-    args_delimeter = r'(?<!\\)\s+'
+    launch_stdio_pattern = r'^/launch_(stdio|inprocess)\s(.+)'
+    launch_config_pattern = r'^/launch_config(\s+.+)?'
 
     print("\nSimple dummy Claude client Started!") # <<======== OUTPUT
     print("Type your queries or '/quit' to exit.") # <<======== OUTPUT
@@ -96,7 +823,8 @@ async def main():
     try:
         while True:
             try:
-                query = input("\nQuery: ").strip() # <<======== INPUT (main context)
+                # Read in a thread so the event loop (server notifications, background tasks) keeps running
+                query = (await asyncio.to_thread(input, "\nQuery: ")).strip() # <<======== INPUT (main context)
 
                 lower_query = query.lower()
 
@@ -107,7 +835,25 @@ async def main():
                     break
 
                 if lower_query == '/list_tools':
-                    print("\n".join(all_tools.keys())) # <<======== OUTPUT
+                    print("\n".join(tool_registry.tools.keys())) # <<======== OUTPUT
+                    continue
+
+                if lower_query == '/cache_stats':
+                    print(cache_stats_report()) # <<======== OUTPUT
+                    continue
+
+                if lower_query == '/stats':
+                    print(stats_report()) # <<======== OUTPUT
+                    continue
+
+                if lower_query == '/history':
+                    print(claude_client.history.report()) # <<======== OUTPUT
+                    continue
+
+                cache_clear_match = re.search(r'^/cache_clear(\s+[a-z_]+)?$', lower_query)
+
+                if cache_clear_match:
+                    tool_result_cache.clear((cache_clear_match.group(1) or "").strip() or None) # <<======== MUTATE (tool_result_cache)
                     continue
 
                 tools_match = re.search(tools_pattern, lower_query)
@@ -117,51 +863,25 @@ async def main():
                     tools_args = [tools_match.group(2), tools_match.group(3)]
 
                     if tools_cmd == 'describe':
-                        if tools_args[0] in all_tools:
-                            print("name:")  # <<======== OUTPUT
-                            print(tools_args[0]) # <<======== OUTPUT
-                            print("description:") # <<======== OUTPUT
-                            print(all_tools[tools_args[0]].description) # <<======== OUTPUT
-                            print("inputSchema:") # <<======== OUTPUT
-                            print(json.dumps(all_tools[tools_args[0]].inputSchema, indent=2)) # <<======== OUTPUT
+                        tool = tool_registry.get(tools_args[0])
+                        if tool:
+                            print(describe_tool(tool)) # <<======== OUTPUT
                         else:
                             print(f"Tool with name \"{tools_args[0]}\" not found") # <<======== OUTPUT
 
                     if tools_cmd == "call":
-                        if tools_args[0] in all_tools:
-                            call_input = dict()
-                            call_tool_args = re.split(args_delimeter, tools_args[1].strip())
-                            for call_tool_arg in call_tool_args:
-                                call_tool_arg_match = re.search(call_tool_arg_pattern, call_tool_arg)
-                                if call_tool_arg_match:
-                                    input_name = call_tool_arg_match.group(1)
-                                    input_value = call_tool_arg_match.group(3)
-                                    if call_tool_arg_match.group(2):
-                                        if "." in input_value:
-                                            call_input[input_name] = float(input_value)
-                                        else:
-                                            call_input[input_name] = int(input_value)
-                                    else:
-                                        call_input[input_name] = input_value
-                                else:
-                                    print(f"\"{call_tool_arg}\" cannot be parsed for tool call input") # <<======== OUTPUT
-
-                            found_stdio_client = None
-                            for stdio_client_elem in stdio_clients:
-                                if stdio_client_elem.have_the_tool(tools_args[0]):
-                                    found_stdio_client = stdio_client_elem
-                                    break
+                        if tools_args[0] in tool_registry:
+                            call_input, errors = parse_call_tool_args(tools_args[1])
+                            for error in errors:
+                                print(error) # <<======== OUTPUT
+
+                            found_stdio_client = tool_registry.owner(tools_args[0])
 
                             if found_stdio_client:
                                 result = await found_stdio_client.process_tool(tools_args[0], call_input) # <<======== CALL_TOOL
                                 # print("result as is:")
                                 # print(result)
-                                print("type:") # <<======== OUTPUT
-                                print(result[0].type) # <<======== OUTPUT
-                                print("text:") # <<======== OUTPUT
-                                print(result[0].text) # <<======== OUTPUT
-                                print("annotations:") # <<======== OUTPUT
-                                print(result[0].annotations) # <<======== OUTPUT
+                                print_content(result) # <<======== OUTPUT
                             else:
                                 print("No suitable stdio client found") # <<======== OUTPUT
 
@@ -173,29 +893,28 @@ async def main():
 
                     continue
 
-                launch_stdio_match = re.search(launch_stdio_pattern, lower_query)
-
-                if launch_stdio_match:
-                    launch_stdio_args = re.split(args_delimeter, launch_stdio_match.group(1))
-
-                    if len(launch_stdio_args) < 2:
-                        print("/launch_stdio command requires at least two additional agruments for stdio: /launch_stdio CWD CMD [CMD_ARG...]") # <<======== OUTPUT
+                # Paths and commands are case-sensitive, so these match the query as is
+                launch_stdio_match = re.search(launch_stdio_pattern, query, re.IGNORECASE)
+                launch_config_match = re.search(launch_config_pattern, query, re.IGNORECASE)
+
+                if launch_stdio_match or launch_config_match:
+                    targets = []
+                    if launch_stdio_match:
+                        # Several servers: /launch_stdio CWD CMD [CMD_ARG...] ; CWD CMD [CMD_ARG...]
+                        targets, errors = parse_launch_targets(launch_stdio_match.group(1).lower(), launch_stdio_match.group(2))
+                        for error in errors:
+                            print(error) # <<======== OUTPUT
                     else:
-                        new_stdio_client = StdioMCPClient()
-                        try:
-                            new_tools = await new_stdio_client.connect_to_server(launch_stdio_args[0], launch_stdio_args[1], launch_stdio_args[2:]) # <<======== CONNECT_MCP_SERVER
-                            for new_tool in new_tools:
-                                if new_tool.name in all_tools:
-                                    raise Exception(f"Tool #{new_tool.name} is already exists") # <<======== EXCEPTION
-
-                            for new_tool in new_tools:
-                                all_tools[new_tool.name] = new_tool  # <<======== MUTATE (all_tools)
-
-                            stdio_clients.append(new_stdio_client) # <<======== MUTATE (stdio_clients)
+                        config_path = (launch_config_match.group(1) or "").strip() or servers_config_path
+                        if config_path:
+                            targets = [target for target, _ in load_servers_config(config_path).values()]
+                        else:
+                            print("/launch_config command requires a config file: /launch_config FILE (or MCP_SERVERS_CONFIG)") # <<======== OUTPUT
 
-                        except Exception as e:
-                            print(f"Error occurred: {e}") # <<======== OUTPUT
-                            await new_stdio_client.cleanup() # <<======== DISCONNECT_MCP_SERVER
+                    # All servers start concurrently, so startup takes as long as the slowest one
+                    errors = await attach_stdio_clients(targets, stdio_clients, tool_registry, pools) # <<======== CONNECT_MCP_SERVER, MUTATE (tool_registry, stdio_clients)
+                    for error in errors:
+                        print(error) # <<======== OUTPUT
 
                     continue
 
@@ -204,42 +923,37 @@ async def main():
                     "role": "user",
                     "content": query
                 }) # <<======== MUTATE:END (claude_client)
-                continue_loop = True
-                while continue_loop:
-                    response = await claude_client.process_query(all_tools.values()) # <<======== CALL_CLAUDE
-                    continue_loop = False
-                    assistant_message_content = []
-                    for content in response:
-                        assistant_message_content.append(content)
-                        if content.type == 'text':
-                            pass
-                        elif content.type == 'tool_use':
-                            tool_name = content.name
-                            tool_args = content.input
-
-                            found_stdio_client = None
-                            for stdio_client_elem in stdio_clients:
-                                if stdio_client_elem.have_the_tool(tool_name):
-                                    found_stdio_client = stdio_client_elem
-                                    break
-                            if found_stdio_client:
-                                result = await found_stdio_client.process_tool(tool_name, tool_args) # <<======== CALL_TOOL
-                            else:
-                                raise Exception(f"No suitable stdio client found for tool: #{tool_name}") # <<======== EXCEPTION
+                with tracer.span("query"):
+                    continue_loop = True
+                    while continue_loop:
+                        tool_tasks = []
+
+                        def start_tool(tool_use):
+                            # Each tool call starts as soon as its tool_use block is complete
+                            tool_tasks.append(asyncio.create_task(call_tool(tool_registry, tool_use))) # <<======== CALL_TOOL
+
+                        usage = dict()
+                        try:
+                            response = await claude_client.process_query(tool_registry, on_text=print_text, on_tool_use=start_tool, usage=usage) # <<======== CALL_CLAUDE
+                        except Exception:
+                            for tool_task in tool_tasks:
+                                tool_task.cancel()
+                            raise
+                        print() # <<======== OUTPUT
+                        print_timings(usage, lag_monitor) # <<======== OUTPUT
+                        continue_loop = False
+
+                        if tool_tasks:
+                            # All tool calls of the turn run concurrently, answered in one message
+                            tool_results = await asyncio.gather(*tool_tasks) # <<======== CALL_TOOL
 
                             claude_client.append_to_messages({ # <<======== MUTATE:BEGIN (claude_client)
                                 "role": "assistant",
-                                "content": assistant_message_content
+                                "content": response
                             }) # <<======== MUTATE:END (claude_client)
                             claude_client.append_to_messages({ # <<======== MUTATE:BEGIN (claude_client)
                                 "role": "user",
-                                "content": [
-                                    {
-                                        "type": "tool_result",
-                                        "tool_use_id": content.id,
-                                        "content": result
-                                    }
-                                ]
+                                "content": list(tool_results)
                             }) # <<======== MUTATE:END (claude_client)
                             continue_loop = True
 
@@ -248,16 +962,18 @@ async def main():
                 print(f"\nError: {str(e)}") # <<======== OUTPUT
 
     finally:
+        watcher.cancel()
+        tracer.export()
         for client in stdio_clients:
+            tool_registry.unregister(client) # <<======== MUTATE (tool_registry)
             await client.cleanup() # <<======== DISCONNECT_MCP_SERVER
+        for pool in pools.values():
+            await pool.close() # <<======== DISCONNECT_MCP_SERVER
 
 ### ======================== "DELIMITED" STUFF BEGINS ========================
 
 # DONE: detect impure parts (with side effects)
-
-def IO(io_type, *params):
-    res = yield {"io_type": io_type, "params": params}
-    return res
+# IO(...) and the runtime which drives computations are in effects.py
 
 def purefunction(query) -> dict:
     prepared_query = query.strip().lower()
@@ -265,19 +981,40 @@ def purefunction(query) -> dict:
     if prepared_query == '':
         return {"io_type": "skip"}
 
+    # Paths and commands are case-sensitive, so these match the query as is
+    launch_match = re.search(r'^/launch_(stdio|inprocess)(\s+.+)?$', query.strip(), re.IGNORECASE)
+    if launch_match:
+        targets, errors = parse_launch_targets(launch_match.group(1).lower(), launch_match.group(2) or "")
+        return {"io_type": "launch", "targets": targets, "errors": errors}
+
+    tools_match = re.search(r'^/(describe|generate|call)_tool\s+([a-z_]+)(\s+.+)?$', query.strip(), re.IGNORECASE)
+    if tools_match:
+        tool_name = tools_match.group(2).lower()
+        if tools_match.group(1).lower() == "call":
+            # Argument values keep their case: handles, paths
+            call_input, errors = parse_call_tool_args(tools_match.group(3))
+            return {"io_type": "call_tool", "tool": tool_name, "input": call_input, "errors": errors}
+        return {"io_type": f"{tools_match.group(1).lower()}_tool", "tool": tool_name}
+
+    launch_config_match = re.search(r'^/launch_config(\s+.+)?$', query.strip(), re.IGNORECASE)
+    if launch_config_match:
+        return {"io_type": "launch_config", "path": (launch_config_match.group(1) or "").strip() or None}
+
     if prepared_query[0] == '/':
         if prepared_query == '/quit':
             return {"io_type": "quit"}
         elif prepared_query == '/list_tools':
             return {"io_type": "list_tools"}
-        elif prepared_query == '/launch_stdio':
-            return {"io_type": "launch_stdio"}
-        elif prepared_query == '/call_tool':
-            pass
-        elif prepared_query == '/describe_tool':
-            pass
-        elif prepared_query == '/generate_tool':
-            pass
+        elif prepared_query == '/stats':
+            return {"io_type": "stats"}
+        elif prepared_query == '/history':
+            return {"io_type": "history"}
+        elif prepared_query == '/cache_stats':
+            return {"io_type": "cache_stats"}
+        elif re.search(r'^/cache_clear(\s+[a-z_]+)?$', prepared_query):
+            # The entries of one tool, or all of them
+            tool_name = prepared_query[len('/cache_clear'):].strip() or None
+            return {"io_type": "cache_clear", "tool": tool_name}
         else:
             return {"io_type": "wrong_command"}
     else:
@@ -297,56 +1034,193 @@ def replbody(q=None):
         pass
 
     if processed_q["io_type"] == "list_tools":
-        tool_list = yield from IO("list_tools")
-        yield from IO("print", tool_list)
+        tool_names = yield from IO("tool_names")
+        yield from IO("print", "\n".join(tool_names))
 
-    if processed_q["io_type"] == "chat":
-        tool_list = yield from IO("list_tools")
-        response = yield from IO("chat", q, tool_list)
-        for content in response:
-            yield from IO("print", content.text)
+    if processed_q["io_type"] == "stats":
+        report = yield from IO("stats")
+        yield from IO("print", report)
+
+    if processed_q["io_type"] == "history":
+        report = yield from IO("history")
+        yield from IO("print", report)
+
+    if processed_q["io_type"] == "cache_stats":
+        report = yield from IO("cache_stats")
+        yield from IO("print", report)
+
+    if processed_q["io_type"] == "cache_clear":
+        yield from IO("cache_clear", processed_q["tool"])
+
+    if processed_q["io_type"] == "describe_tool":
+        tool = yield from IO("get_tool", processed_q["tool"])
+        if tool:
+            yield from IO("print", describe_tool(tool))
+        else:
+            yield from IO("print", f"Tool with name \"{processed_q['tool']}\" not found")
+
+    if processed_q["io_type"] == "call_tool":
+        for error in processed_q["errors"]:
+            yield from IO("print", error)
+        result = yield from IO("run_tool", processed_q["tool"], processed_q["input"])
+        if "error" in result:
+            yield from IO("print", result["error"])
+        else:
+            # Every part, long text a chunk at a time
+            yield from IO("print_content", result["content"])
+
+    if processed_q["io_type"] == "generate_tool":
+        yield from IO("print", "Tool generation is not supported yet :)")
 
-    if processed_q["io_type"] == "launch_stdio":
-        # I-AM-HERE: add more commands
-        # ideas: recursive accum?
-        yield from IO("print", f"Not supported yet: {q}")
+    if processed_q["io_type"] == "chat":
+        messages = [{"role": "user", "content": q}]
+        while True:
+            # The text of the response is printed while it streams in, with the tools of the registry
+            response = yield from IO("chat", messages)
+            tool_uses = [block for block in response if block.type == "tool_use"]
+            if not tool_uses:
+                break
+            # All tool calls of the turn run concurrently, answered in one message
+            tool_results = yield from IO("gather", [effect("call_tool", tool_use) for tool_use in tool_uses])
+            messages = messages + [
+                {"role": "assistant", "content": response},
+                {"role": "user", "content": tool_results},
+            ]
+
+    if processed_q["io_type"] == "launch":
+        for error in processed_q["errors"]:
+            yield from IO("print", error)
+        if processed_q["targets"]:
+            # All servers start concurrently, so it takes as long as the slowest one
+            errors = yield from IO("launch", processed_q["targets"])
+            for error in errors:
+                yield from IO("print", error)
+
+    if processed_q["io_type"] == "launch_config":
+        errors = yield from IO("launch_config", processed_q["path"])
+        for error in errors:
+            yield from IO("print", error)
 
     if processed_q["io_type"] == "wrong_command":
         yield from IO("print", f"Wrong command: {q}")
 
-    yield from replbody()
+    # Tail call: the runtime replaces this computation instead of nesting it,
+    # so the stack stays flat however long the session is
+    yield from IO("continue", replbody())
 
 async def dmain():
-    computation = replbody()
-    io = None
-
     claude_client = ClaudeClient()
+    tool_registry = ToolRegistry()
+    register_local_tools(tool_registry)
+    stdio_clients = []
+    lag_monitor = LoopLagMonitor()
+    lag_monitor.start()
 
     print("\nSimple dummy Claude client Started!")
     print("Type your queries or '/quit' to exit.")
 
-    while True:
+    # Servers with a "warm" count in MCP_SERVERS_CONFIG are pre-started in the background
+    servers_config_path = os.environ.get("MCP_SERVERS_CONFIG")
+    servers_config = load_servers_config(servers_config_path) if servers_config_path else dict()
+    pools = dict()
+    for target, warm in servers_config.values():
+        if warm > 0:
+            pools[target] = StdioServerPool(target, warm)
+            pools[target].start()
+    # Attached servers which crash are started again
+    watcher = asyncio.create_task(watch_stdio_clients(stdio_clients, tool_registry, pools))
+
+    handlers = Handlers()
+    handlers.register("print", print)
+    # The registry is refreshed by tools/list_changed, the servers aren't asked again per query
+    handlers.register("tool_names", lambda: list(tool_registry.tools.keys()))
+    handlers.register("stats", stats_report)
+    handlers.register("history", lambda: claude_client.history.report())
+    handlers.register("cache_stats", cache_stats_report)
+    handlers.register("cache_clear", tool_result_cache.clear)
+    handlers.register("get_tool", tool_registry.get)
+    handlers.register("print_content", print_content)
+
+    @handlers.register("run_tool")
+    async def run_tool(tool_name, tool_input):
+        """/call_tool: the content of the result, or an error message."""
+        owner = tool_registry.owner(tool_name)
+        if owner is None:
+            return {"error": f"Tool with name \"{tool_name}\" not found"}
         try:
-            if io is None:
-                io = next(computation)
+            return {"content": await owner.process_tool(tool_name, tool_input)}
+        except Exception as e:
+            return {"error": f"Error: {e}"}
+
+    @handlers.register("read")
+    async def read(prompt):
+        return await asyncio.to_thread(input, prompt)
+
+    @handlers.register("launch")
+    async def launch(targets):
+        return await attach_stdio_clients(targets, stdio_clients, tool_registry, pools)
+
+    @handlers.register("launch_config")
+    async def launch_config(path):
+        path = path or servers_config_path
+        if not path:
+            return ["/launch_config command requires a config file: /launch_config FILE (or MCP_SERVERS_CONFIG)"]
+        try:
+            targets = [target for target, _ in load_servers_config(path).values()]
+        except (OSError, ValueError, KeyError) as e:
+            return [f"Error occurred: {e}"]
+        return await attach_stdio_clients(targets, stdio_clients, tool_registry, pools)
+
+    @handlers.register("call_tool")
+    async def call_tool_effect(tool_use):
+        return await call_tool(tool_registry, tool_use)
+
+    @handlers.register("chat")
+    async def chat(messages):
+        claude_client.flush_messages()
+        for message in messages:
+            claude_client.append_to_messages(message)
+        usage = dict()
+        response = await claude_client.process_query(tool_registry, on_text=print_text, usage=usage)
+        print()
+        print_timings(usage, lag_monitor)
+        return response
+
+    # CLIENT_EFFECT_TRACE=FILE records the session for `client.py --replay FILE`
+    trace_path = os.environ.get("CLIENT_EFFECT_TRACE")
+    handle = Recorder(handlers, trace_path) if trace_path else handlers
 
-            if io["io_type"] == "chat":
-                claude_client.flush_messages()
-                claude_client.append_to_messages({
-                    "role": "user",
-                    "content": io["params"][0]
-                })
-                response = await claude_client.process_query(io["params"][1])
-                io = computation.send(response)
-            elif io["io_type"] == "print":
-                print(io["params"][0])
-                io = next(computation)
-            elif io["io_type"] == "list_tools":
-                io = computation.send([])
-            elif io["io_type"] == "read":
-                io = computation.send(input(io["params"][0]))
-        except StopIteration:
-            break
+    try:
+        # Servers of MCP_SERVERS_CONFIG are started (concurrently) up front, warm ones claimed from their pools
+        targets = [target for target, _ in servers_config.values()]
+        for error in await attach_stdio_clients(targets, stdio_clients, tool_registry, pools):
+            print(error)
+
+        await arun(replbody(), handle)
+    finally:
+        watcher.cancel()
+        tracer.export()
+        if trace_path:
+            handle.close()
+        for client in stdio_clients:
+            await client.cleanup()
+        for pool in pools.values():
+            await pool.close()
+
+
+async def replay(trace_path, realtime=False) -> dict:
+    """Run replbody against a recorded trace: no model API, servers or console."""
+    replayer = Replayer(trace_path, realtime)
+    started = time.perf_counter()
+    await arun(replbody(), replayer)
+    elapsed = time.perf_counter() - started
+    if replayer.position != len(replayer.records):
+        raise ReplayMismatch(f"Session ended after {replayer.position} of {len(replayer.records)} recorded effects")
+    return {
+        "effects": replayer.position,
+        "seconds": round(elapsed, 4),
+        "effects_per_second": round(replayer.position / elapsed, 1) if elapsed else 0.0,
+    }
 
 
 ### ======================== "DELIMITED" STUFF ENDS ========================
@@ -358,4 +1232,8 @@ async def dmain():
 
 if __name__ == "__main__":
     import sys
-    asyncio.run(dmain())
\ No newline at end of file
+    if "--replay" in sys.argv:
+        # python client.py --replay TRACE [--realtime]
+        print(asyncio.run(replay(sys.argv[sys.argv.index("--replay") + 1], "--realtime" in sys.argv)))
+    else:
+        asyncio.run(dmain())
\ No newline at end of file
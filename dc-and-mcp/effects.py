@@ -0,0 +1,198 @@
+# Effect runtime for the "delimited" computations of client.py
+#
+# A computation is a generator which yields effects (`IO(...)`) and gets
+# their results sent back. Two effects are handled by the runtime itself:
+#
+#   IO("continue", generator)  - tail call: the current computation is done
+#                                and `generator` takes its place
+#   IO("call", generator)      - run `generator` and send its return value back
+#
+# Neither of them nests generators (as `yield from` does), the driver keeps
+# an explicit stack instead, so a computation which loops by continuing
+# with itself runs forever with constant stack depth and per-step cost.
+#
+# With registered `Handlers` the async driver also handles
+#
+#   IO("gather", [effect(...) or generator, ...])
+#
+# which runs independent effects (and whole computations) concurrently and
+# sends back the list of their results.
+#
+# A `Recorder` around the handlers writes every effect with its result to a
+# trace file, a `Replayer` sends the recorded results back without running
+# anything: the computation replays the session with no network, servers
+# or console, and stops at the first effect which differs from the trace.
+import asyncio
+import importlib
+import inspect
+import json
+import time
+
+
+def effect(io_type, *params) -> dict:
+    return {"io_type": io_type, "params": params}
+
+
+# Creates a specific IO operation and yields it, to
+# be catched by the outside IO loop
+def IO(io_type, *params):
+    res = yield effect(io_type, *params)
+    return res
+
+
+class Trampoline:
+    def __init__(self, computation):
+        self.stack = [computation]
+        self.value = None
+
+    def step(self):
+        """Advance to the next effect to be handled outside; None when the computation is over."""
+        while self.stack:
+            try:
+                io = self.stack[-1].send(self.value)
+            except StopIteration as stop:
+                self.stack.pop()
+                self.value = stop.value
+                continue
+
+            self.value = None
+            if io["io_type"] == "continue":
+                self.stack[-1].close()
+                self.stack[-1] = io["params"][0]
+            elif io["io_type"] == "call":
+                self.stack.append(io["params"][0])
+            else:
+                return io
+        return None
+
+    def resume(self, value):
+        self.value = value
+
+
+def run(computation, handle):
+    """Run a computation with a synchronous `handle(io) -> result`."""
+    trampoline = Trampoline(computation)
+    while (io := trampoline.step()) is not None:
+        trampoline.resume(handle(io))
+    return trampoline.value
+
+
+async def arun(computation, handle):
+    """Run a computation with an async `handle(io) -> result`."""
+    trampoline = Trampoline(computation)
+    while (io := trampoline.step()) is not None:
+        trampoline.resume(await handle(io))
+    return trampoline.value
+
+
+# io_type -> handler(*params), sync or async
+class Handlers:
+    def __init__(self):
+        self.handlers = dict()
+
+    def register(self, io_type, handler=None):
+        """`handlers.register("print", print)` or as a decorator: `@handlers.register("print")`."""
+        if handler is None:
+            return lambda handler: self.register(io_type, handler)
+        self.handlers[io_type] = handler
+        return handler
+
+    async def __call__(self, io):
+        if io["io_type"] == "gather":
+            return await asyncio.gather(*(self.gathered(item) for item in io["params"][0]))
+
+        handler = self.handlers.get(io["io_type"])
+        if handler is None:
+            raise LookupError(f"No handler for effect: {io['io_type']}")
+        result = handler(*io["params"])
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def gathered(self, item):
+        if inspect.isgenerator(item):
+            return await arun(item, self)
+        return await self(item)
+
+
+def encode(value):
+    """JSON-compatible form of effect params and results; pydantic models are restored by `decode`."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if hasattr(value, "model_dump") and hasattr(type(value), "model_validate"):
+        cls = type(value)
+        return {"__model__": f"{cls.__module__}:{cls.__qualname__}", "data": value.model_dump(mode="json")}
+    # Servers, clients etc.: only their kind is recorded
+    return {"__object__": type(value).__name__}
+
+
+def decode(value):
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if isinstance(value, dict):
+        if "__model__" in value:
+            module, _, name = value["__model__"].partition(":")
+            cls = importlib.import_module(module)
+            for attr in name.split("."):
+                cls = getattr(cls, attr)
+            return cls.model_validate(value["data"])
+        return {key: decode(item) for key, item in value.items()}
+    return value
+
+
+# Handles effects with `handle` and writes each one to a trace file, one JSON line:
+# {"io": io_type, "p": params, "r": result, "d": seconds spent}
+# A trace holds one session, recording overwrites the file.
+class Recorder:
+    def __init__(self, handle, path):
+        self.handle = handle
+        self.file = open(path, "w")
+
+    async def __call__(self, io):
+        started = time.perf_counter()
+        result = await self.handle(io)
+        record = {
+            "io": io["io_type"],
+            "p": encode(io["params"]),
+            "r": encode(result),
+            "d": round(time.perf_counter() - started, 6),
+        }
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.file.flush()
+        return result
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayMismatch(Exception):
+    pass
+
+
+# Sends the results of a trace back, as fast as possible or (`realtime`) after the recorded time
+class Replayer:
+    def __init__(self, path, realtime=False):
+        with open(path) as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        self.realtime = realtime
+        self.position = 0
+
+    async def __call__(self, io):
+        if self.position >= len(self.records):
+            raise ReplayMismatch(f"Effect #{self.position} ({io['io_type']}) is past the end of the trace")
+
+        record = self.records[self.position]
+        if record["io"] != io["io_type"] or record["p"] != encode(io["params"]):
+            raise ReplayMismatch(
+                f"Effect #{self.position} differs: recorded {record['io']}{record['p']}, "
+                f"got {io['io_type']}{encode(io['params'])}"
+            )
+
+        self.position += 1
+        if self.realtime:
+            await asyncio.sleep(record["d"])
+        return decode(record["r"])
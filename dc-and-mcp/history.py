@@ -0,0 +1,207 @@
+# Bounded conversation history of the model client
+#
+#   history = ConversationHistory.from_env()
+#   history.append({"role": "user", "content": query})
+#   ... send history.messages, append the response and the tool results ...
+#   history.saved()  # {"bytes": ..., "tokens": ...} left out of the request
+#
+# Every round trip sends the whole conversation, so a query with many tool
+# rounds costs quadratic tokens. Messages are kept as plain dicts (SDK and
+# MCP objects are converted once) with their serialized size, and
+#
+#   * a tool result identical to an earlier one in the history is replaced
+#     by a reference to it. When the earlier one is cut down, the full
+#     result moves to the first reference and the others point there.
+#   * when the history grows over its budget (CLIENT_HISTORY_MAX_BYTES,
+#     CLIENT_HISTORY_MAX_TOKENS), the oldest tool results are cut down to
+#     their first CLIENT_HISTORY_SUMMARY_CHARS characters and a note, until
+#     it is back under COMPACT_TO of the budget. The latest
+#     CLIENT_HISTORY_KEEP_RECENT messages (the results the model has not
+#     seen yet) are always sent whole.
+#
+# Tokens are estimated from bytes, there is no tokenizer on the client.
+import hashlib
+import json
+import os
+
+BYTES_PER_TOKEN = 4
+
+# Compaction goes this far below the budget, so the history (and the
+# cached prompt prefix) changes once every few rounds instead of every round
+COMPACT_TO = 0.75
+
+# Results shorter than their reference aren't deduplicated
+MIN_DEDUPE_BYTES = 200
+
+
+def as_dict(block) -> dict:
+    return block if isinstance(block, dict) else block.model_dump(exclude_none=True)
+
+
+def compact_message(message) -> dict:
+    """Copy of a message with plain dict content blocks, tool result content included.
+
+    Tool result blocks are always copied, compaction changes them in place.
+    """
+    content = message["content"]
+    if not isinstance(content, str):
+        content = [as_dict(block) for block in content]
+        content = [
+            dict(block, content=[as_dict(item) for item in block["content"]]
+                 if isinstance(block.get("content"), list) else block.get("content", ""))
+            if block.get("type") == "tool_result" else block
+            for block in content
+        ]
+    return {"role": message["role"], "content": content}
+
+
+def message_size(message) -> int:
+    return len(json.dumps(message, separators=(",", ":")))
+
+
+def reference(tool_use_id) -> str:
+    return f"[Same result as tool call {tool_use_id} above]"
+
+
+def result_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n".join(item.get("text", "") for item in content if item.get("type") == "text")
+
+
+class ConversationHistory:
+    def __init__(self, max_bytes=200_000, max_tokens=0, keep_recent=2, summary_chars=300):
+        # 0 disables a budget; with both set the smaller one applies
+        budgets = [budget for budget in (max_bytes, max_tokens * BYTES_PER_TOKEN) if budget > 0]
+        self.budget = min(budgets) if budgets else 0
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        self.clear()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            int(os.environ.get("CLIENT_HISTORY_MAX_BYTES", 200_000)),
+            int(os.environ.get("CLIENT_HISTORY_MAX_TOKENS", 0)),
+            int(os.environ.get("CLIENT_HISTORY_KEEP_RECENT", 2)),
+            int(os.environ.get("CLIENT_HISTORY_SUMMARY_CHARS", 300)),
+        )
+
+    def clear(self):
+        self.messages = []
+        self.sizes = []
+        self.bytes = 0
+        # Size the history would have without deduplication and compaction
+        self.original_bytes = 0
+        # Digest of a tool result -> tool_use_id of the first result with it, and back
+        self.seen = dict()
+        self.digests = dict()
+        # tool_use_id of a result -> (message index, block) of the results replaced by a reference to it
+        self.references = dict()
+        self.deduplicated = set()
+        # tool_use_id -> tool name, for the notes
+        self.tool_names = dict()
+        self.elided = set()
+        self.stats = {"deduplicated": 0, "elided": 0}
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def append(self, message):
+        message = compact_message(message)
+        self.original_bytes += message_size(message)
+        for block in message["content"] if isinstance(message["content"], list) else []:
+            if block.get("type") == "tool_use":
+                self.tool_names[block["id"]] = block["name"]
+            elif block.get("type") == "tool_result" and not block.get("is_error"):
+                self._dedupe(block, len(self.messages))
+
+        self.messages.append(message)
+        self.sizes.append(message_size(message))
+        self.bytes += self.sizes[-1]
+        if self.budget and self.bytes > self.budget:
+            self._compact(int(self.budget * COMPACT_TO))
+
+    def _dedupe(self, block, index):
+        """Replace the content of a result block in message `index` by a reference to an identical one."""
+        tool_use_id = block["tool_use_id"]
+        serialized = json.dumps(block["content"], sort_keys=True, separators=(",", ":"))
+        if len(serialized) < MIN_DEDUPE_BYTES:
+            return
+        digest = hashlib.sha1(serialized.encode()).digest()
+        first = self.seen.setdefault(digest, tool_use_id)
+        if first == tool_use_id:
+            self.digests[tool_use_id] = digest
+            return
+        block["content"] = reference(first)
+        self.references.setdefault(first, []).append((index, block))
+        self.deduplicated.add(tool_use_id)
+        self.stats["deduplicated"] += 1
+
+    def _move_result(self, block) -> set:
+        """Move the content of a result that is about to be cut down to the first result referencing it.
+
+        Returns the indexes of the messages that changed.
+        """
+        tool_use_id = block["tool_use_id"]
+        digest = self.digests.pop(tool_use_id, None)
+        references = self.references.pop(tool_use_id, [])
+        if not references:
+            # Later copies of it are kept whole again
+            self.seen.pop(digest, None)
+            return set()
+
+        (index, holder), rest = references[0], references[1:]
+        holder["content"] = block["content"]
+        holder_id = holder["tool_use_id"]
+        self.deduplicated.discard(holder_id)
+        self.stats["deduplicated"] -= 1
+        for _, other in rest:
+            other["content"] = reference(holder_id)
+        if rest:
+            self.references[holder_id] = rest
+        self.seen[digest] = holder_id
+        self.digests[holder_id] = digest
+        return {index} | {other_index for other_index, _ in rest}
+
+    def _compact(self, target):
+        """Cut down the oldest tool results until the history is at most `target` bytes."""
+        for index in range(len(self.messages) - self.keep_recent):
+            if self.bytes <= target:
+                return
+            message = self.messages[index]
+            if isinstance(message["content"], str):
+                continue
+            changed = set()
+            for block in message["content"]:
+                tool_use_id = block.get("tool_use_id")
+                if block.get("type") != "tool_result" or tool_use_id in self.elided or tool_use_id in self.deduplicated:
+                    continue
+                text = result_text(block["content"])
+                tool_name = self.tool_names.get(tool_use_id, "tool")
+                summary = (f"{text[:self.summary_chars]}\n[{len(text) - self.summary_chars} more "
+                           f"characters of this {tool_name} result were left out of the history]")
+                # A result barely over summary_chars would grow by its note
+                if len(summary) >= len(text):
+                    continue
+                # Results referencing this one still need it whole
+                changed |= self._move_result(block)
+                block["content"] = summary
+                self.elided.add(tool_use_id)
+                self.stats["elided"] += 1
+                changed.add(index)
+            for changed_index in changed:
+                size = message_size(self.messages[changed_index])
+                self.bytes += size - self.sizes[changed_index]
+                self.sizes[changed_index] = size
+
+    def saved(self) -> dict:
+        saved_bytes = self.original_bytes - self.bytes
+        return {"bytes": saved_bytes, "tokens": saved_bytes // BYTES_PER_TOKEN}
+
+    def report(self) -> str:
+        budget = f"{self.budget} bytes" if self.budget else "none"
+        saved = self.saved()
+        return (f"messages: {len(self.messages)}, bytes: {self.bytes} (budget: {budget}), "
+                f"saved: {saved['bytes']} bytes (~{saved['tokens']} tokens), "
+                f"deduplicated results: {self.stats['deduplicated']}, elided results: {self.stats['elided']}")
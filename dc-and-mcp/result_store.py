@@ -0,0 +1,170 @@
+# Out-of-band storage of oversized tool results
+#
+# A tool result whose text is larger than CLIENT_TOOL_RESULT_MAX_BYTES
+# (a nationwide alert dump, a container log) is written to a local
+# content-addressed store, the file name is the hash of the text, and the
+# model gets the first CLIENT_TOOL_RESULT_PREVIEW_BYTES of it and a handle
+# instead. The store offers the `read_tool_result` tool itself, registered
+# in the ToolRegistry like the tools of a server, which returns the rest
+# page by page:
+#
+#   read_tool_result(handle="3f2a...", offset=2000)
+#
+# Offsets are in bytes of the UTF-8 text, a page never ends inside a
+# character. Non-text parts of a result are passed through unchanged.
+# The store is pruned, oldest files first, when it grows over
+# CLIENT_RESULT_STORE_MAX_BYTES.
+import hashlib
+import os
+import re
+
+from mcp import types
+
+HANDLE_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Upper bound of the `limit` of one page
+MAX_PAGE_BYTES = 32 * 1024
+
+READ_TOOL = types.Tool(
+    name="read_tool_result",
+    description="Read a page of a tool result that was too large to return in full. "
+                "The truncated result names its handle and the offset to continue at.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "handle": {"type": "string", "description": "handle of the stored result"},
+            "offset": {"type": "integer", "minimum": 0, "description": "byte offset to start at (default 0)"},
+            "limit": {"type": "integer", "minimum": 1, "maximum": MAX_PAGE_BYTES,
+                      "description": "maximum number of bytes to return"},
+        },
+        "required": ["handle"],
+    },
+)
+
+
+def utf8_prefix(data: bytes) -> bytes:
+    """`data` without a character cut off at its end."""
+    try:
+        data.decode()
+    except UnicodeDecodeError as e:
+        if e.reason == "unexpected end of data":
+            return data[:e.start]
+    return data
+
+
+class ResultStore:
+    def __init__(self, directory, max_bytes=16 * 1024, preview_bytes=2000, page_bytes=8000,
+                 max_store_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        # 0 returns every result in full
+        self.max_bytes = max_bytes
+        self.preview_bytes = preview_bytes
+        self.page_bytes = page_bytes
+        self.max_store_bytes = max_store_bytes
+        self.tools = [READ_TOOL]
+        self.name = "client"
+        self.stats = {"spilled": 0, "spilled_bytes": 0, "pages": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("CLIENT_RESULT_STORE") or os.path.expanduser("~/.cache/dc-and-mcp/tool-results"),
+            int(os.environ.get("CLIENT_TOOL_RESULT_MAX_BYTES", 16 * 1024)),
+            int(os.environ.get("CLIENT_TOOL_RESULT_PREVIEW_BYTES", 2000)),
+            int(os.environ.get("CLIENT_TOOL_RESULT_PAGE_BYTES", 8000)),
+            int(os.environ.get("CLIENT_RESULT_STORE_MAX_BYTES", 256 * 1024 * 1024)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def oversized(self, content) -> bool:
+        if not self.enabled:
+            return False
+        texts = [part.text for part in content if part.type == "text"]
+        # A character takes one to four bytes, only text close to the limit is encoded to measure it
+        chars = sum(len(text) for text in texts)
+        if chars > self.max_bytes or chars * 4 <= self.max_bytes:
+            return chars > self.max_bytes
+        return sum(len(text.encode()) for text in texts) > self.max_bytes
+
+    def path(self, handle) -> str:
+        if not HANDLE_PATTERN.fullmatch(handle):
+            raise Exception(f"Invalid tool result handle: {handle}")
+        return os.path.join(self.directory, handle)
+
+    def put(self, data: bytes) -> str:
+        handle = hashlib.sha256(data).hexdigest()[:32]
+        path = self.path(handle)
+        if os.path.exists(path):
+            # Stored already: it is recent again for pruning
+            os.utime(path)
+            return handle
+
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+        self.prune(keep=handle)
+        return handle
+
+    def prune(self, keep=None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and HANDLE_PATTERN.fullmatch(entry.name) and entry.name != keep:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_store_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def spill(self, content) -> list:
+        """Store the text of an oversized result; its preview and handle replace it."""
+        data = "\n".join(part.text for part in content if part.type == "text").encode()
+        handle = self.put(data)
+        preview = utf8_prefix(data[:self.preview_bytes])
+        self.stats["spilled"] += 1
+        self.stats["spilled_bytes"] += len(data)
+        note = (f"\n[Result truncated: showing {len(preview)} of {len(data)} bytes. Call read_tool_result "
+                f"with handle=\"{handle}\" and offset={len(preview)} to read the rest, up to "
+                f"{self.page_bytes} bytes per page.]")
+        text = types.TextContent(type="text", text=preview.decode() + note)
+        return [text] + [part for part in content if part.type != "text"]
+
+    def read(self, handle, offset=0, limit=None) -> str:
+        limit = min(int(limit) if limit else self.page_bytes, MAX_PAGE_BYTES)
+        try:
+            with open(self.path(handle), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(offset)
+                data = f.read(limit)
+        except FileNotFoundError:
+            raise Exception(f"No stored tool result with handle {handle}") from None
+
+        end = offset + len(data)
+        if end < size:
+            data = utf8_prefix(data)
+            end = offset + len(data)
+        self.stats["pages"] += 1
+        footer = (f"\n[Bytes {offset}-{end} of {size}. Continue with offset={end}.]" if end < size
+                  else f"\n[Bytes {offset}-{end} of {size}, end of the result.]")
+        return data.decode(errors="replace") + footer
+
+    async def process_tool(self, tool_name, tool_args) -> list:
+        if tool_name != READ_TOOL.name:
+            raise Exception(f"Unknown tool: {tool_name}")
+        text = self.read(str(tool_args["handle"]), int(tool_args.get("offset", 0)), tool_args.get("limit"))
+        return [types.TextContent(type="text", text=text)]
+
+    def report(self) -> str:
+        return (f"store: {self.directory}, threshold: {self.max_bytes} bytes, "
+                f"spilled results: {self.stats['spilled']} ({self.stats['spilled_bytes']} bytes), "
+                f"pages read: {self.stats['pages']}")
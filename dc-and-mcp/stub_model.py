@@ -0,0 +1,176 @@
+"""Local stub of the Anthropic Messages API for testing the clients offline.
+
+Usage:
+    uv run stub_model.py [--port 8766] [--first-token-ms 300] [--token-delay-ms 20]
+                         [--tool NAME=JSON_INPUT ...] [--rounds 1]
+
+Then run a client with `ANTHROPIC_BASE_URL=http://127.0.0.1:8766` (any
+`ANTHROPIC_API_KEY` value works). A user text message is answered with
+the `--tool` calls when the request offers those tools, and so are tool
+results until `--rounds` rounds of tool calls were made; anything else
+with a short streamed text answer. Both streaming and
+non-streaming requests are supported, and so is (simulated) prompt
+caching: usage reports cache reads and writes for `cache_control` prefixes.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+class StubModel:
+    def __init__(self, first_token_delay=0.3, token_delay=0.02, tool_calls=None, rounds=1):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.tool_calls = tool_calls or []
+        self.rounds = rounds
+        self.ids = itertools.count(1)
+        self.cached = set()
+        self.app = Starlette(routes=[Route("/v1/messages", self.messages, methods=["POST"])])
+
+    def reply(self, body) -> tuple[list, str]:
+        """Content blocks and stop reason for a request body."""
+        last = body["messages"][-1]
+        offered = {tool["name"] for tool in body.get("tools", [])}
+        calls = [(name, tool_input) for name, tool_input in self.tool_calls if name in offered]
+
+        is_text = isinstance(last["content"], str) or all(block.get("type") == "text" for block in last["content"])
+        rounds = sum(1 for message in body["messages"] if message["role"] == "assistant")
+        if last["role"] == "user" and (is_text or rounds < self.rounds) and calls:
+            blocks = [{"type": "text", "text": "Let me check that."}]
+            for name, tool_input in calls:
+                blocks.append({"type": "tool_use", "id": f"toolu_stub_{next(self.ids)}",
+                               "name": name, "input": tool_input})
+            return blocks, "tool_use"
+
+        results = [
+            block for block in (last["content"] if isinstance(last["content"], list) else [])
+            if isinstance(block, dict) and block.get("type") == "tool_result"
+        ]
+        text = f"This is a stub answer based on {len(results)} tool results." if results \
+            else "This is a stub answer from the local model server."
+        return [{"type": "text", "text": text}], "end_turn"
+
+    def usage(self, body, blocks) -> dict:
+        # Rough token estimate: four characters per token
+        input_tokens = len(json.dumps(body)) // 4
+        cache_read, cache_creation = self.prompt_cache(body)
+        return {
+            "input_tokens": max(input_tokens - cache_read - cache_creation, 0),
+            "output_tokens": len(json.dumps(blocks)) // 4,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_creation,
+        }
+
+    def prompt_cache(self, body) -> tuple[int, int]:
+        """Simulated prompt caching: (tokens read, tokens written) for the cache_control breakpoints.
+
+        The longest prefix seen before is read from the cache, the rest up to
+        the last breakpoint is written to it.
+        """
+        def strip(value):
+            if isinstance(value, dict):
+                return {key: strip(item) for key, item in value.items() if key != "cache_control"}
+            if isinstance(value, list):
+                return [strip(item) for item in value]
+            return value
+
+        parts = list(body.get("tools", []))
+        for message in body["messages"]:
+            content = message["content"]
+            parts.extend([{"role": message["role"], "text": content}] if isinstance(content, str) else
+                         [dict(block, role=message["role"]) for block in content])
+
+        prefix, breakpoints = "", []
+        for part in parts:
+            prefix += json.dumps(strip(part), sort_keys=True)
+            if isinstance(part, dict) and "cache_control" in part:
+                breakpoints.append(prefix)
+        if not breakpoints:
+            return 0, 0
+
+        read = max((len(prefix) for prefix in breakpoints if prefix in self.cached), default=0) // 4
+        self.cached.update(breakpoints)
+        return read, len(breakpoints[-1]) // 4 - read
+
+    async def messages(self, request: Request):
+        body = await request.json()
+        blocks, stop_reason = self.reply(body)
+        usage = self.usage(body, blocks)
+        message = {
+            "id": f"msg_stub_{next(self.ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": blocks,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.first_token_delay)
+            return JSONResponse(message)
+
+        return StreamingResponse(self.events(message), media_type="text/event-stream")
+
+    async def events(self, message):
+        def event(name, data):
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+        start = dict(message, content=[], stop_reason=None,
+                     usage=dict(message["usage"], output_tokens=1))
+        yield event("message_start", {"type": "message_start", "message": start})
+        await asyncio.sleep(self.first_token_delay)
+
+        for index, block in enumerate(message["content"]):
+            if block["type"] == "text":
+                yield event("content_block_start", {"type": "content_block_start", "index": index,
+                                                    "content_block": {"type": "text", "text": ""}})
+                for word in block["text"].split(" "):
+                    yield event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                        "delta": {"type": "text_delta", "text": word + " "}})
+                    await asyncio.sleep(self.token_delay)
+            else:
+                yield event("content_block_start", {"type": "content_block_start", "index": index,
+                                                    "content_block": dict(block, input={})})
+                yield event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                    "delta": {"type": "input_json_delta",
+                                                              "partial_json": json.dumps(block["input"])}})
+                await asyncio.sleep(self.token_delay)
+            yield event("content_block_stop", {"type": "content_block_stop", "index": index})
+
+        yield event("message_delta", {"type": "message_delta",
+                                      "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                                      "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        yield event("message_stop", {"type": "message_stop"})
+
+
+def parse_tool_call(value):
+    name, _, tool_input = value.partition("=")
+    return name, json.loads(tool_input or "{}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    parser.add_argument("--tool", action="append", default=[], type=parse_tool_call, metavar="NAME=JSON_INPUT",
+                        help="tool call to answer user text with, e.g. get_alerts='{\"state\": \"CA\"}'")
+    parser.add_argument("--rounds", type=int, default=1, help="rounds of tool calls per conversation")
+    args = parser.parse_args()
+
+    stub = StubModel(args.first_token_ms / 1000, args.token_delay_ms / 1000, args.tool, args.rounds)
+    uvicorn.run(stub.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
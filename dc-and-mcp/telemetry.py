@@ -0,0 +1,190 @@
+# Timed spans and latency histograms of the client
+#
+#   with tracer.span("tool", tool="get_forecast", server="weather") as span:
+#       ... span.traceparent ...
+#
+# A span is a child of the span open around it (contextvars, so tasks
+# started inside it inherit it). Its `traceparent` is sent to MCP servers
+# in the `_meta` of tool calls, so their spans join the same trace.
+#
+# Every ended span is observed in a histogram by name and labels, and, with
+# CLIENT_SPAN_LOG=FILE, appended to a JSON lines file. CLIENT_METRICS_FILE=FILE
+# keeps the histograms there in the Prometheus text format.
+import json
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(samples, q) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Bucket counts for export, the latest samples for percentiles
+class Histogram:
+    def __init__(self, samples=1024):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+
+
+class Metrics:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        # (name, ((label, value), ...)) -> Histogram
+        self.histograms = dict()
+
+    def observe(self, name, seconds, labels):
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(seconds)
+
+    def samples(self, name, by=None) -> dict:
+        """Latest samples of the `name` histograms, merged per value of the label `by` (all of them without)."""
+        merged = dict()
+        for (histogram_name, labels), histogram in self.histograms.items():
+            value = dict(labels).get(by) if by else ""
+            if histogram_name == name and value is not None:
+                merged.setdefault(value, []).extend(histogram.recent)
+        return merged
+
+    def report(self, groups) -> str:
+        """p50/p95 table of `(title, name, by)` groups, e.g. ("server", "tool", "server")."""
+        lines = []
+        for title, name, by in groups:
+            for value, samples in sorted(self.samples(name, by).items()):
+                lines.append(f"{(title + ' ' + value).strip():<40} n={len(samples):<6} "
+                             f"p50={percentile(samples, 0.50) * 1000:8.1f}ms "
+                             f"p95={percentile(samples, 0.95) * 1000:8.1f}ms")
+        return "\n".join(lines) if lines else "No spans recorded yet"
+
+    def prometheus(self) -> str:
+        lines = []
+        for name in sorted({name for name, _ in self.histograms}):
+            metric = f"{self.prefix}_{name}_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, labels), histogram in sorted(self.histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{{{format_labels(labels, le=str(bound))}}} {cumulative}")
+                lines.append(f"{metric}_bucket{{{format_labels(labels, le='+Inf')}}} {histogram.count}")
+                lines.append(f"{metric}_sum{{{format_labels(labels)}}} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{{{format_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Replaced atomically, so a collector never reads half a file
+        with open(f"{path}.tmp", "w") as f:
+            f.write(self.prometheus())
+        os.replace(f"{path}.tmp", path)
+
+
+def format_labels(labels, **extra) -> str:
+    items = list(labels) + list(extra.items())
+    return ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in items)
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, labels):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.labels = labels
+        self.start = time.time()
+        self.duration = 0.0
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        # W3C trace context
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "error": self.error,
+            **self.labels,
+        }
+
+
+current_span = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, metrics, span_log=None, metrics_path=None, export_interval=10.0):
+        self.metrics = metrics
+        self.span_log = span_log
+        self.metrics_path = metrics_path
+        self.export_interval = export_interval
+        self._exported = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            Metrics("client"),
+            span_log=os.environ.get("CLIENT_SPAN_LOG") or None,
+            metrics_path=os.environ.get("CLIENT_METRICS_FILE") or None,
+        )
+
+    @contextmanager
+    def span(self, name, **labels):
+        parent = current_span.get()
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        span = Span(name, trace_id, parent.span_id if parent else None, labels)
+        token = current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = span.error or type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            current_span.reset(token)
+            self._end(span)
+
+    def _end(self, span):
+        self.metrics.observe(span.name, span.duration, span.labels)
+        if self.span_log:
+            with open(self.span_log, "a") as f:
+                f.write(json.dumps(span.as_dict(), separators=(",", ":")) + "\n")
+        # The metrics file is rewritten at most every export_interval seconds
+        if self.metrics_path and time.monotonic() - self._exported >= self.export_interval:
+            self.export()
+
+    def export(self):
+        if self.metrics_path:
+            self.metrics.write(self.metrics_path)
+            self._exported = time.monotonic()
+
+
+tracer = Tracer.from_env()
@@ -0,0 +1,110 @@
+import unittest
+
+from history import COMPACT_TO, ConversationHistory, reference, result_text
+
+
+def tool_use(tool_use_id) -> dict:
+    return {"role": "assistant", "content": [{"type": "tool_use", "id": tool_use_id, "name": "get_alerts", "input": {}}]}
+
+
+def tool_result(tool_use_id, text) -> dict:
+    return {"role": "user", "content": [
+        {"type": "tool_result", "tool_use_id": tool_use_id, "content": [{"type": "text", "text": text}]}
+    ]}
+
+
+class ConversationHistoryTest(unittest.TestCase):
+    def call(self, history, tool_use_id, text):
+        history.append(tool_use(tool_use_id))
+        history.append(tool_result(tool_use_id, text))
+
+    def results(self, history) -> dict:
+        """tool_use_id -> text of its result as it would be sent."""
+        return {block["tool_use_id"]: result_text(block["content"])
+                for message in history.messages if isinstance(message["content"], list)
+                for block in message["content"] if block.get("type") == "tool_result"}
+
+    def test_identical_result_is_sent_as_a_reference(self):
+        history = ConversationHistory(max_bytes=0)
+        self.call(history, "t1", "a" * 1000)
+        self.call(history, "t2", "a" * 1000)
+        self.call(history, "t3", "short")
+        self.call(history, "t4", "short")
+
+        results = self.results(history)
+        self.assertEqual(results["t2"], reference("t1"))
+        self.assertEqual(results["t4"], "short")
+        self.assertEqual(history.stats["deduplicated"], 1)
+        self.assertGreater(history.saved()["bytes"], 900)
+
+    def test_compacted_result_moves_to_its_first_reference(self):
+        history = ConversationHistory(max_bytes=4000, keep_recent=2, summary_chars=100)
+        self.call(history, "t1", "a" * 3000)
+        self.call(history, "t2", "b" * 1500)
+        # A reference in the recent messages to a result which is compacted now
+        self.call(history, "t3", "a" * 3000)
+
+        results = self.results(history)
+        self.assertTrue(results["t1"].startswith("a" * 100 + "\n[2900 more characters"))
+        self.assertTrue(results["t2"].startswith("b" * 100 + "\n[1400 more characters"))
+        self.assertEqual(results["t3"], "a" * 3000)
+        self.assertEqual(history.stats, {"deduplicated": 0, "elided": 2})
+        self.assertEqual(history.bytes, sum(history.sizes))
+
+    def test_other_references_follow_the_moved_result(self):
+        history = ConversationHistory(max_bytes=8000, keep_recent=2, summary_chars=100)
+        self.call(history, "t1", "a" * 3000)
+        self.call(history, "t2", "a" * 3000)
+        self.call(history, "t3", "b" * 3000)
+        self.call(history, "t4", "a" * 3000)
+        self.assertEqual(self.results(history)["t4"], reference("t1"))
+        self.call(history, "t5", "c" * 1500)
+
+        # t1 moved to t2, which was old enough to be compacted as well: t4 has it whole
+        results = self.results(history)
+        self.assertEqual([len(results[tool_use_id]) < 300 for tool_use_id in ("t1", "t2", "t3")], [True] * 3)
+        self.assertEqual(results["t4"], "a" * 3000)
+        self.assertEqual(history.stats, {"deduplicated": 0, "elided": 3})
+
+        # Later copies refer to the result that is whole now
+        self.call(history, "t6", "a" * 3000)
+        self.assertEqual(self.results(history)["t6"], reference("t4"))
+
+    def test_recent_messages_are_kept_whole(self):
+        history = ConversationHistory(max_bytes=1000, keep_recent=2, summary_chars=100)
+        self.call(history, "t1", "a" * 3000)
+
+        self.assertEqual(self.results(history)["t1"], "a" * 3000)
+        self.assertEqual(history.stats["elided"], 0)
+
+        self.call(history, "t2", "b" * 3000)
+        results = self.results(history)
+        self.assertLess(len(results["t1"]), 300)
+        self.assertEqual(results["t2"], "b" * 3000)
+
+    def test_compaction_goes_below_the_budget(self):
+        history = ConversationHistory(max_bytes=10_000, keep_recent=0, summary_chars=100)
+        for index, letter in enumerate("abcd"):
+            self.call(history, f"t{index}", letter * 2000)
+        self.assertEqual(history.stats["elided"], 0)
+
+        self.call(history, "t4", "e" * 2000)
+        self.assertLessEqual(history.bytes, history.budget * COMPACT_TO)
+        elided = history.stats["elided"]
+        self.assertGreater(elided, 0)
+
+        # Back under the budget, the next result doesn't compact anything
+        self.call(history, "t5", "f" * 500)
+        self.assertLess(history.bytes, history.budget)
+        self.assertEqual(history.stats["elided"], elided)
+
+    def test_result_barely_over_the_summary_is_not_compacted(self):
+        history = ConversationHistory(max_bytes=100, keep_recent=0, summary_chars=100)
+        self.call(history, "t1", "a" * 120)
+
+        self.assertEqual(self.results(history)["t1"], "a" * 120)
+        self.assertGreaterEqual(history.saved()["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
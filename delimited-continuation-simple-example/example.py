@@ -15,18 +15,33 @@ def count(x, n=None):
 
     if (x <= n):
         yield from IO("print", x)
-        yield from count(x+1, n)
+        # Not `yield from count(x+1, n)`: every nested generator would stay
+        # on the delegation chain, the IO loop continues with it instead
+        yield from IO("continue", count(x+1, n))
 
-computation = count(0)
+# The IO loop is a trampoline: "continue" replaces the current computation,
+# so the stack depth (and the cost of a step) doesn't grow with the count
+def run(computation, handle):
+    value = None
+    while True:
+        try:
+            io = computation.send(value)
+        except StopIteration as stop:
+            return stop.value
 
-while True:
-    try:
-        io = next(computation)
-    except StopIteration:
-        break
+        value = None
+        if io["io_type"] == "continue":
+            computation.close()
+            computation = io["params"][0]
+        else:
+            value = handle(io)
 
-    # Pick a specific IO action to execute
+# Pick a specific IO action to execute
+def handle(io):
     if io["io_type"] == "print":
         print(io["params"][0])
     elif io["io_type"] == "read":
-        computation.send(input("Specify n:"))
+        return input("Specify n:")
+
+if __name__ == "__main__":
+    run(count(0), handle)
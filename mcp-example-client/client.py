@@ -2,54 +2,135 @@ import asyncio
 from typing import Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
 
-from anthropic import Anthropic
 from dotenv import load_dotenv
 
+import anyio
+import importlib.util
+import os
+import sys
+import time
+
 load_dotenv()  # load environment variables from .env
 
+
+def print_text(text: str):
+    print(text, end="", flush=True)
+
+
 class MCPClient:
-    def __init__(self):
+    def __init__(self, max_concurrent_tools: int = 4):
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self._anthropic = None
+        # Limits concurrent tool calls to the server
+        self.tool_semaphore = asyncio.Semaphore(max_concurrent_tools)
+        # Time to first token of the last model call and the worst event loop lag seen
+        self.last_ttft: Optional[float] = None
+        self.max_loop_lag = 0.0
+        self.last_usage: Optional[dict] = None
+        # Tools converted for the model, until the server reports a change of its tool list
+        self.available_tools: Optional[list] = None
+        # Mark the tool definitions and the conversation so far as cacheable prompt prefixes
+        self.prompt_cache = bool(os.environ.get("CLIENT_PROMPT_CACHE"))
     # methods will go here
 
-    async def connect_to_server(self, server_script_path: str):
+    @property
+    def anthropic(self):
+        # Created on the first chat turn: importing anthropic is a large part of the start up time
+        if self._anthropic is None:
+            from anthropic import AsyncAnthropic
+            self._anthropic = AsyncAnthropic()
+        return self._anthropic
+
+    async def connect_to_server(self, server_script_path: str, in_process: bool = False):
         """Connect to an MCP server
 
         Args:
             server_script_path: Path to the server script (.py or .js)
+            in_process: Import a Python FastMCP server (its `mcp` instance) and
+                run it in this process instead of spawning it; for trusted
+                servers whose dependencies are installed here
         """
         is_python = server_script_path.endswith('.py')
         is_js = server_script_path.endswith('.js')
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
 
-        command = "python" if is_python else "node"
-        server_params = StdioServerParameters(
-            command=command,
-            args=[server_script_path],
-            env=None
-        )
-
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+        if in_process:
+            if not is_python:
+                raise ValueError("Only a Python server can run in process")
+            await self.connect_in_process(server_script_path)
+        else:
+            command = "python" if is_python else "node"
+            server_params = StdioServerParameters(
+                command=command,
+                args=[server_script_path],
+                env=None
+            )
+
+            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+            self.stdio, self.write = stdio_transport
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.write, message_handler=self.handle_message)
+            )
 
         await self.session.initialize()
 
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
-
+        tools = await self.get_available_tools()
+        print("\nConnected to server with tools:", [tool["name"] for tool in tools])
+
+
+    async def connect_in_process(self, server_script_path: str):
+        """Run the server's FastMCP instance in this process, connected through memory streams"""
+        path = os.path.abspath(server_script_path)
+        # The server's own imports are relative to its directory
+        sys.path.insert(0, os.path.dirname(path))
+        spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        server = module.mcp._mcp_server
+
+        client_streams, server_streams = await self.exit_stack.enter_async_context(create_client_server_memory_streams())
+        task_group = await self.exit_stack.enter_async_context(anyio.create_task_group())
+        task_group.start_soon(lambda: server.run(*server_streams, server.create_initialization_options()))
+        self.exit_stack.callback(task_group.cancel_scope.cancel)
+
+        self.session = await self.exit_stack.enter_async_context(
+            ClientSession(*client_streams, message_handler=self.handle_message)
+        )
 
-    async def process_query(self, query: str) -> str:
-        """Process a query using Claude and available tools"""
+    async def handle_message(self, message) -> None:
+        if isinstance(message, types.ServerNotification) and \
+                isinstance(message.root, types.ToolListChangedNotification):
+            self.available_tools = None
+
+    async def get_available_tools(self) -> list:
+        """Tool definitions for the model, listed and converted once per tool list of the server"""
+        if self.available_tools is None:
+            response = await self.session.list_tools()
+            available_tools = [{
+                "name": tool.name,
+                "description": tool.description,
+                "input_schema": tool.inputSchema
+            } for tool in response.tools]
+            if self.prompt_cache and available_tools:
+                # The tool block is the same in every request: cache it as a prompt prefix
+                available_tools[-1]["cache_control"] = {"type": "ephemeral"}
+            self.available_tools = available_tools
+        return self.available_tools
+
+    async def process_query(self, query: str, on_text=print_text) -> str:
+        """Process a query using Claude and available tools
+
+        Text is passed to `on_text` while it streams in and every tool call
+        starts as soon as its `tool_use` block is complete.
+        """
         messages = [
             {
                 "role": "user",
@@ -57,83 +138,145 @@ class MCPClient:
             }
         ]
 
-        response = await self.session.list_tools()
-        available_tools = [{
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in response.tools]
-
-        # Initial Claude API call
-        response = self.anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            messages=messages,
-            tools=available_tools
-        )
+        available_tools = await self.get_available_tools()
 
         # Process response and handle tool calls
         final_text = []
 
-        assistant_message_content = []
-        for content in response.content:
-            if content.type == 'text':
-                final_text.append(content.text)
-                assistant_message_content.append(content)
-            elif content.type == 'tool_use':
-                tool_name = content.name
-                tool_args = content.input
-
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-
-                assistant_message_content.append(content)
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_message_content
-                })
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content.id,
-                            "content": result.content
-                        }
-                    ]
-                })
-
-                # Get next response from Claude
-                response = self.anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=1000,
-                    messages=messages,
-                    tools=available_tools
-                )
-
-                final_text.append(response.content[0].text)
+        while True:
+            tool_tasks = []
+
+            def start_tool(tool_use):
+                on_text(f"\n[Calling tool {tool_use.name} with args {tool_use.input}]\n")
+                tool_tasks.append(asyncio.create_task(self.call_tool(tool_use)))
+
+            try:
+                content = await self.stream_response(messages, available_tools, on_text, start_tool)
+            except BaseException:
+                for task in tool_tasks:
+                    task.cancel()
+                raise
+
+            for block in content:
+                if block.type == 'text':
+                    final_text.append(block.text)
+                elif block.type == 'tool_use':
+                    final_text.append(f"[Calling tool {block.name} with args {block.input}]")
+
+            if not tool_tasks:
+                break
+
+            tool_results = await asyncio.gather(*tool_tasks)
+
+            messages.append({
+                "role": "assistant",
+                "content": content
+            })
+            messages.append({
+                "role": "user",
+                "content": list(tool_results)
+            })
 
         return "\n".join(final_text)
 
+    async def stream_response(self, messages, available_tools, on_text, on_tool_use) -> list:
+        """Stream one Claude response and return its content blocks"""
+        if self.prompt_cache:
+            messages = self.with_cache_breakpoint(messages)
+
+        started = time.perf_counter()
+        self.last_ttft = None
+        async with self.anthropic.messages.stream(
+            model="claude-3-5-sonnet-20241022",
+            max_tokens=1000,
+            messages=messages,
+            tools=available_tools
+        ) as stream:
+            async for event in stream:
+                if self.last_ttft is None and event.type in ("text", "input_json"):
+                    self.last_ttft = time.perf_counter() - started
+                if event.type == "text":
+                    on_text(event.text)
+                elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    on_tool_use(event.content_block)
+            response = await stream.get_final_message()
+
+        self.last_usage = {
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+            # Prompt prefix tokens read from / written to the cache
+            "cache_read_input_tokens": response.usage.cache_read_input_tokens or 0,
+            "cache_creation_input_tokens": response.usage.cache_creation_input_tokens or 0,
+        }
+        return response.content
+
+    @staticmethod
+    def with_cache_breakpoint(messages: list) -> list:
+        """Copy of `messages` whose last content block ends a cacheable prefix; the history itself isn't changed"""
+        last = messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        else:
+            content = [block if isinstance(block, dict) else block.model_dump(exclude_none=True) for block in content]
+        content[-1] = dict(content[-1], cache_control={"type": "ephemeral"})
+        return messages[:-1] + [dict(last, content=content)]
+
+    async def watch_loop_lag(self, interval: float = 0.01):
+        """Record how late the event loop wakes up a sleeping task, i.e. how long it was blocked"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.max_loop_lag = max(self.max_loop_lag, loop.time() - started - interval)
+
+    def print_timings(self):
+        if os.environ.get("CLIENT_TIMINGS"):
+            ttft = f"{self.last_ttft:.3f}s" if self.last_ttft is not None else "n/a"
+            usage = self.last_usage
+            tokens = ", ".join(f"{name}: {count}" for name, count in usage.items()) if usage else "n/a"
+            print(f"[time to first token: {ttft}, max event loop lag: {self.max_loop_lag * 1000:.1f}ms, tokens: {tokens}]")
+            self.max_loop_lag = 0.0
+
+    async def call_tool(self, tool_use) -> dict:
+        """Execute one tool_use block and return its tool_result block"""
+        async with self.tool_semaphore:
+            try:
+                result = await self.session.call_tool(tool_use.name, tool_use.input)
+            except Exception as e:
+                return {"type": "tool_result", "tool_use_id": tool_use.id, "content": str(e), "is_error": True}
+
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": result.content
+        }
 
     async def chat_loop(self):
         """Run an interactive chat loop"""
         print("\nMCP Client Started!")
         print("Type your queries or 'quit' to exit.")
 
-        while True:
-            try:
-                query = input("\nQuery: ").strip()
+        lag_watcher = asyncio.create_task(self.watch_loop_lag())
+        try:
+            while True:
+                try:
+                    # Read in a thread so the event loop keeps serving the session
+                    query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
 
-                if query.lower() == 'quit':
-                    break
+                    if query.lower() == 'quit':
+                        break
 
-                response = await self.process_query(query)
-                print("\n" + response)
+                    print()
+                    # The response is printed while it streams in
+                    await self.process_query(query)
+                    print()
+                    self.print_timings()
 
-            except Exception as e:
-                print(f"\nError: {str(e)}")
+                except Exception as e:
+                    print(f"\nError: {str(e)}")
+        finally:
+            lag_watcher.cancel()
 
     async def cleanup(self):
         """Clean up resources"""
@@ -141,13 +284,17 @@ class MCPClient:
 
 
 async def main():
-    if len(sys.argv) < 2:
-        print("Usage: python client.py <path_to_server_script>")
+    args = sys.argv[1:]
+    in_process = "--inprocess" in args
+    if in_process:
+        args.remove("--inprocess")
+    if len(args) < 1:
+        print("Usage: python client.py [--inprocess] <path_to_server_script>")
         sys.exit(1)
 
     client = MCPClient()
     try:
-        await client.connect_to_server(sys.argv[1])
+        await client.connect_to_server(args[0], in_process)
         await client.chat_loop()
     finally:
         await client.cleanup()
@@ -0,0 +1,194 @@
+"""In-memory index of all active NWS alerts, refreshed on an interval."""
+import asyncio
+import contextvars
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from records import AlertRecord
+
+logger = logging.getLogger(__name__)
+
+# Attributes an alert is indexed by; every key is stored upper-cased
+INDEX_KEYS = ("state", "zone", "severity", "event")
+
+
+@dataclass(slots=True)
+class IndexedAlert:
+    id: str
+    seq: int
+    record: AlertRecord
+    keys: dict[str, tuple[str, ...]]
+
+
+@dataclass
+class AlertIndexStats:
+    """Refresh counters and current size of the alert index."""
+    refreshes: int = 0
+    failures: int = 0
+    last_added: int = 0
+    last_removed: int = 0
+    size: int = 0
+    age_seconds: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def alert_keys(properties: dict) -> dict[str, tuple[str, ...]]:
+    """Index keys of an alert; the state is the prefix of its UGC zone codes."""
+    zones = tuple(code.upper() for code in properties.get("geocode", {}).get("UGC", []))
+    return {
+        "state": tuple(dict.fromkeys(zone[:2] for zone in zones)),
+        "zone": zones,
+        "severity": (str(properties.get("severity", "Unknown")).upper(),),
+        "event": (str(properties.get("event", "Unknown")).upper(),),
+    }
+
+
+class AlertIndex:
+    """Nationwide alerts polled from /alerts/active and indexed by state,
+    UGC zone, severity and event.
+
+    Refreshes diff on the alert `id`: alerts seen before keep their record
+    (and its rendered text), only new ones are built and only gone ones are
+    dropped. Polling starts with `start`, so a server which is only asked
+    for forecasts never polls, and stops when the index is closed.
+    """
+
+    def __init__(self, url: str, fetch: Callable[[str], Awaitable[dict | None]],
+                 interval: float = 60.0):
+        self.url = url
+        self.fetch = fetch
+        self.interval = interval
+        self.alerts: dict[str, IndexedAlert] = {}
+        self.index: dict[str, dict[str, dict[str, None]]] = {key: {} for key in INDEX_KEYS}
+        self.refreshed_at: float | None = None
+        self._stats = AlertIndexStats()
+        self._seq = 0
+        self._last_data: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._open = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def age(self) -> float | None:
+        """Seconds since the last successful refresh."""
+        if self.refreshed_at is None:
+            return None
+        return time.monotonic() - self.refreshed_at
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index is recent enough to answer queries."""
+        age = self.age()
+        return age is not None and age < 3 * self.interval
+
+    @property
+    def stats(self) -> AlertIndexStats:
+        self._stats.size = len(self.alerts)
+        age = self.age()
+        self._stats.age_seconds = round(age, 1) if age is not None else None
+        return self._stats
+
+    def query(self, **filters: str | None) -> list[IndexedAlert]:
+        """Alerts matching every given filter (state, zone, severity, event)."""
+        buckets = [
+            self.index[key].get(value.upper(), {})
+            for key, value in filters.items()
+            if value
+        ]
+        if not buckets:
+            return sorted(self.alerts.values(), key=lambda alert: alert.seq)
+        buckets.sort(key=len)
+        smallest, rest = buckets[0], buckets[1:]
+        ids = [alert_id for alert_id in smallest if all(alert_id in bucket for bucket in rest)]
+        return sorted((self.alerts[alert_id] for alert_id in ids), key=lambda alert: alert.seq)
+
+    def apply(self, features: Iterable[dict]) -> None:
+        """Replace the indexed alerts with `features`, touching only changes."""
+        current = {}
+        added = 0
+        for feature in features:
+            alert_id = feature.get("id") or feature["properties"].get("id")
+            if alert_id in current:
+                continue
+            alert = self.alerts.get(alert_id)
+            if alert is None:
+                alert = self._add(alert_id, feature)
+                added += 1
+            current[alert_id] = alert
+
+        removed = [alert_id for alert_id in self.alerts if alert_id not in current]
+        for alert_id in removed:
+            self._remove(self.alerts[alert_id])
+
+        self.alerts = current
+        self._stats.last_added = added
+        self._stats.last_removed = len(removed)
+
+    async def refresh(self) -> bool:
+        data = await self.fetch(self.url)
+        if not data or "features" not in data:
+            self._stats.failures += 1
+            return False
+        # A cached, unchanged response needs no diffing at all
+        if data is not self._last_data:
+            self.apply(data["features"])
+            self._last_data = data
+        self._stats.refreshes += 1
+        self.refreshed_at = time.monotonic()
+        return True
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                self._stats.failures += 1
+                logger.exception("Alert index refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start polling, unless it runs already or the index is closed."""
+        if self.enabled and self._open and self._task is None:
+            # A fresh context: the polls don't belong to the span of the request which started them
+            self._task = asyncio.create_task(self.run(), context=contextvars.Context())
+
+    async def __aenter__(self) -> "AlertIndex":
+        self._open = True
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._open = False
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _add(self, alert_id: str, feature: dict) -> IndexedAlert:
+        self._seq += 1
+        alert = IndexedAlert(
+            id=alert_id,
+            seq=self._seq,
+            record=AlertRecord.from_feature(feature),
+            keys=alert_keys(feature["properties"]),
+        )
+        for key, values in alert.keys.items():
+            for value in values:
+                self.index[key].setdefault(value, {})[alert_id] = None
+        return alert
+
+    def _remove(self, alert: IndexedAlert) -> None:
+        for key, values in alert.keys.items():
+            bucket = self.index[key]
+            for value in values:
+                ids = bucket.get(value)
+                if ids is not None:
+                    ids.pop(alert.id, None)
+                    if not ids:
+                        del bucket[value]
@@ -0,0 +1,187 @@
+"""Load benchmark of the weather MCP server against a local fake NWS API.
+
+Usage:
+    uv run bench_load.py [--transport inprocess|stdio] [--requests N] [--concurrency C]
+                         [--alerts-ratio R] [--latency-ms MS] [--error-rate P] [--replay DIR]
+                         [--env KEY=VALUE ...] [--output FILE] [--compare BASELINE]
+
+`inprocess` calls the FastMCP tools of an imported `weather` module;
+`stdio` spawns `weather.py` and talks to it through an MCP `ClientSession`.
+Results (latency percentiles, requests per second, upstream calls per
+route, peak RSS) are printed and optionally saved as JSON, and a saved run
+can be passed to `--compare` to spot regressions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+from fake_nws import STATES, FakeNWS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOCATIONS = [(30.0 + i * 0.7, -120.0 + i * 1.3) for i in range(20)]
+
+ToolCall = Callable[[str, dict], Awaitable[str]]
+
+
+@asynccontextmanager
+async def inprocess_server(env: dict[str, str]) -> AsyncIterator[ToolCall]:
+    # Settings are read at import time, so the environment goes first
+    os.environ.update(env)
+    import weather
+
+    async def call(name: str, arguments: dict) -> str:
+        content = await weather.mcp.call_tool(name, arguments)
+        return content[0].text if content else ""
+
+    async with weather.server_lifespan(weather.mcp):
+        yield call
+
+
+@asynccontextmanager
+async def stdio_server(env: dict[str, str]) -> AsyncIterator[ToolCall]:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(HERE, "weather.py")],
+        cwd=HERE,
+        env={**os.environ, **env},
+    )
+
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+
+                async def call(name: str, arguments: dict) -> str:
+                    result = await session.call_tool(name, arguments)
+                    if result.isError:
+                        raise RuntimeError(result.content[0].text if result.content else "tool error")
+                    return result.content[0].text if result.content else ""
+
+                yield call
+
+
+def make_workload(count: int, alerts_ratio: float, seed: int) -> list[tuple[str, dict]]:
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(count):
+        if rng.random() < alerts_ratio:
+            workload.append(("get_alerts", {"state": rng.choice(STATES)}))
+        else:
+            latitude, longitude = rng.choice(LOCATIONS)
+            workload.append(("get_forecast", {"latitude": latitude, "longitude": longitude}))
+    return workload
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+async def drive(call: ToolCall, workload: list[tuple[str, dict]], concurrency: int) -> dict:
+    queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            name, arguments = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                text = await call(name, arguments)
+                if text.startswith("Unable to fetch"):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fake = FakeNWS(args.latency_ms / 1000, args.error_rate, args.replay)
+    workload = make_workload(args.requests, args.alerts_ratio, args.seed)
+
+    async with fake.serve() as base_url:
+        # Reproducible runs: no grid point cache left over from earlier runs
+        env = {"NWS_API_BASE": base_url, "WEATHER_GRIDPOINT_DB": ""}
+        env.update(item.split("=", 1) for item in args.env)
+        server = inprocess_server if args.transport == "inprocess" else stdio_server
+        async with server(env) as call:
+            results = await drive(call, workload, args.concurrency)
+
+    usage = resource.RUSAGE_SELF if args.transport == "inprocess" else resource.RUSAGE_CHILDREN
+    results["upstream_calls"] = sum(fake.calls.values())
+    results["upstream_calls_by_route"] = dict(fake.calls)
+    # ru_maxrss is in KiB on Linux
+    results["peak_rss_mb"] = round(resource.getrusage(usage).ru_maxrss / 1024, 1)
+    return results
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print("\nvs baseline:")
+    for key in ("p50_ms", "p95_ms", "p99_ms", "rps", "upstream_calls", "peak_rss_mb"):
+        old, new = baseline.get(key), results.get(key)
+        if not old or new is None:
+            continue
+        print(f"  {key:>15}: {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["inprocess", "stdio"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--alerts-ratio", type=float, default=0.5)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--replay", help="directory with recorded alerts.json, points.json, forecast.json")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the weather server")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
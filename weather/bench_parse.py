@@ -0,0 +1,133 @@
+"""Compare a full `json()` decode of NWS payloads with the projected parse.
+
+Usage:
+    uv run bench_parse.py --record URL FILE        # save a live payload as a fixture
+    uv run bench_parse.py --generate N FILE        # write a synthetic alerts payload
+    uv run bench_parse.py [--kind alerts|forecast] FILE...
+
+Every mode runs in a fresh interpreter, so the reported peak RSS belongs to
+that mode alone.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import projection
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_projection(kind: str) -> projection.Projection:
+    return projection.ALERTS if kind == "alerts" else projection.ForecastProjection(5)
+
+
+async def file_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def parse_stream(path: str, kind: str) -> dict:
+    projected = make_projection(kind)
+    reader = projection.AsyncByteReader(file_chunks(path))
+    return await projected.collect(projection.load_ijson().items_async(reader, projected.prefix, use_float=True))
+
+
+def parse_full(path: str, kind: str) -> dict:
+    # What make_nws_request did before projections: decode the whole body
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def run_mode(mode: str, path: str, kind: str, repeat: int) -> dict:
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if mode == "full":
+            parse_full(path, kind)
+        else:
+            asyncio.run(parse_stream(path, kind))
+        timings.append(time.perf_counter() - started)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "file": path,
+        "parse_seconds": round(min(timings), 4),
+        "peak_rss_delta_kb": rss_after - rss_before,
+    }
+
+
+def record(url: str, path: str) -> None:
+    import httpx
+    response = httpx.get(url, headers={"User-Agent": "weather-app/1.0", "Accept": "application/geo+json"},
+                         timeout=60.0, follow_redirects=True)
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        f.write(response.content)
+    print(f"Saved {len(response.content)} bytes to {path}")
+
+
+def generate(count: int, path: str) -> None:
+    ring = [[-100.0 + i / 100, 30.0 + i / 100] for i in range(200)]
+    features = [{
+        "id": f"urn:oid:alert.{i}",
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "properties": {
+            "id": f"urn:oid:alert.{i}",
+            "areaDesc": "Somewhere County",
+            "geocode": {"SAME": ["048001"], "UGC": [f"TXZ{i % 300:03d}"]},
+            "affectedZones": [f"https://api.weather.gov/zones/forecast/TXZ{i % 300:03d}"],
+            "severity": "Moderate",
+            "event": "Flood Warning",
+            "description": "Flooding is occurring. " * 40,
+            "instruction": "Turn around, don't drown. " * 10,
+            "parameters": {"NWSheadline": ["FLOOD WARNING REMAINS IN EFFECT"] * 3},
+        },
+    } for i in range(count)]
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    print(f"Wrote {count} alerts to {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--kind", choices=["alerts", "forecast"], default="alerts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--record", nargs=2, metavar=("URL", "FILE"))
+    parser.add_argument("--generate", nargs=2, metavar=("N", "FILE"))
+    parser.add_argument("--mode", choices=["full", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.record:
+        record(*args.record)
+        return
+    if args.generate:
+        generate(int(args.generate[0]), args.generate[1])
+        return
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.files[0], args.kind, args.repeat)))
+        return
+    if projection.load_ijson() is None:
+        sys.exit("ijson is not installed: uv sync --extra streaming")
+
+    for path in args.files:
+        for mode in ("full", "stream"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--kind", args.kind,
+                 "--repeat", str(args.repeat), path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            print(f"{path} {mode:>6}: {result['parse_seconds']:.4f}s, "
+                  f"peak RSS +{result['peak_rss_delta_kb'] / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
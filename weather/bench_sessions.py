@@ -0,0 +1,188 @@
+"""Session load test: one SSE server for all clients vs a stdio process per client.
+
+Usage:
+    uv run bench_sessions.py [--transport sse|stdio|both] [--sessions 40] [--concurrency 10]
+                             [--calls 4] [--latency-ms 50] [--output FILE]
+
+Every session connects, initializes, makes `--calls` `get_forecast` calls
+against a local fake NWS API and disconnects; `--concurrency` sessions are
+open at a time. Reported per transport: sessions per second, session setup
+latency percentiles, upstream calls (caches are per process, so one shared
+server calls upstream less) and peak RSS of all server processes, also per
+concurrently open session.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import TextIO
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+
+from bench_load import HERE, LOCATIONS, percentile
+from fake_nws import FakeNWS
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def children_rss() -> int:
+    """Total resident memory in bytes of the direct child processes (the servers)."""
+    total = 0
+    parent = str(os.getpid())
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The process name may contain spaces, the fields after it don't
+                fields = f.read().rsplit(")", 1)[1].split()
+            if fields[1] != parent:
+                continue
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError):
+            continue
+    return total
+
+
+async def sample_peak(peak: list[int], interval: float = 0.05) -> None:
+    while True:
+        peak[0] = max(peak[0], children_rss())
+        await asyncio.sleep(interval)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def sse_server(env: dict[str, str]) -> AsyncIterator[str]:
+    port = free_port()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(HERE, "weather.py"), "--transport", "sse", "--port", str(port),
+        cwd=HERE, env={**os.environ, **env},
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                break
+            except OSError:
+                if process.returncode is not None:
+                    raise RuntimeError("weather.py --transport sse exited")
+                await asyncio.sleep(0.05)
+        yield f"http://127.0.0.1:{port}/sse"
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+@asynccontextmanager
+async def open_session(transport: str, env: dict[str, str], url: str | None,
+                       errlog: TextIO) -> AsyncIterator[ClientSession]:
+    if transport == "sse":
+        streams = sse_client(url)
+    else:
+        params = StdioServerParameters(command=sys.executable, args=[os.path.join(HERE, "weather.py")],
+                                       cwd=HERE, env={**os.environ, **env})
+        streams = stdio_client(params, errlog=errlog)
+    async with streams as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+async def run_transport(transport: str, args: argparse.Namespace, base_url: str, errlog: TextIO) -> dict:
+    # Reproducible runs: no grid point cache left over from earlier runs
+    env = {"NWS_API_BASE": base_url, "WEATHER_GRIDPOINT_DB": ""}
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    setups: list[float] = []
+    errors = 0
+    peak = [0]
+
+    async def session_run(url: str | None) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async with open_session(transport, env, url, errlog) as session:
+                    setups.append(time.perf_counter() - started)
+                    for _ in range(args.calls):
+                        latitude, longitude = rng.choice(LOCATIONS)
+                        result = await session.call_tool("get_forecast", {"latitude": latitude, "longitude": longitude})
+                        if result.isError:
+                            errors += 1
+            except Exception:
+                errors += 1
+
+    sampler = asyncio.create_task(sample_peak(peak))
+    try:
+        if transport == "sse":
+            async with sse_server(env) as url:
+                started = time.perf_counter()
+                await asyncio.gather(*(session_run(url) for _ in range(args.sessions)))
+                elapsed = time.perf_counter() - started
+        else:
+            started = time.perf_counter()
+            await asyncio.gather(*(session_run(None) for _ in range(args.sessions)))
+            elapsed = time.perf_counter() - started
+    finally:
+        sampler.cancel()
+
+    return {
+        "sessions": args.sessions,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "sessions_per_second": round(args.sessions / elapsed, 2),
+        "setup_p50_ms": round(percentile(setups, 0.50) * 1000, 1),
+        "setup_p95_ms": round(percentile(setups, 0.95) * 1000, 1),
+        "peak_rss_mb": round(peak[0] / 2**20, 1),
+        "rss_per_open_session_mb": round(peak[0] / 2**20 / min(args.concurrency, args.sessions), 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {}
+    transports = ["sse", "stdio"] if args.transport == "both" else [args.transport]
+    # stderr of the stdio servers, one handle shared by all sessions
+    with open(os.devnull, "w") as errlog:
+        for transport in transports:
+            fake = FakeNWS(args.latency_ms / 1000)
+            async with fake.serve() as base_url:
+                results[transport] = await run_transport(transport, args, base_url, errlog)
+            results[transport]["upstream_calls"] = sum(fake.calls.values())
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["sse", "stdio", "both"], default="both")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Local stand-in for api.weather.gov used by the benchmarks.
+
+Serves the endpoints the weather server calls, with synthetic or replayed
+payloads, optional latency and error injection and per-route call
+counters. Run it standalone with `uv run fake_nws.py --port 8765` and
+point the server at it with `NWS_API_BASE=http://127.0.0.1:8765`.
+
+Replay files (e.g. saved with `bench_parse.py --record`) are read from a
+directory: `alerts.json` (all active alerts, filtered per state for area
+queries), `points.json` and `forecast.json`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+STATES = ("AL", "AZ", "CA", "CO", "FL", "GA", "IL", "NY", "OK", "TX", "WA")
+
+
+def synthetic_alerts(alerts_per_state: int) -> dict:
+    features = []
+    for state in STATES:
+        for i in range(alerts_per_state):
+            alert_id = f"urn:oid:fake.{state}.{i}"
+            features.append({
+                "id": alert_id,
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [[[-100.0 + j / 10, 35.0] for j in range(50)]]},
+                "properties": {
+                    "id": alert_id,
+                    "areaDesc": f"{state} County {i}",
+                    "geocode": {"UGC": [f"{state}Z{i:03d}"]},
+                    "severity": random.choice(["Extreme", "Severe", "Moderate", "Minor"]),
+                    "event": random.choice(["Flood Warning", "Wind Advisory", "Heat Advisory"]),
+                    "description": "Synthetic alert description. " * 20,
+                    "instruction": "Synthetic instructions. " * 5,
+                },
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def synthetic_forecast() -> dict:
+    return {"properties": {"periods": [{
+        "number": i + 1,
+        "name": f"Period {i + 1}",
+        "temperature": 60 + i,
+        "temperatureUnit": "F",
+        "windSpeed": "5 to 10 mph",
+        "windDirection": "NW",
+        "shortForecast": "Partly Cloudy",
+        "detailedForecast": "Partly cloudy, with a high near 60. Northwest wind 5 to 10 mph.",
+    } for i in range(14)]}}
+
+
+class FakeNWS:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 replay_dir: str | None = None, alerts_per_state: int = 5):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls: Counter[str] = Counter()
+        self.alerts = self._load(replay_dir, "alerts.json") or synthetic_alerts(alerts_per_state)
+        self.points = self._load(replay_dir, "points.json")
+        self.forecast = self._load(replay_dir, "forecast.json") or synthetic_forecast()
+        self.app = Starlette(routes=[
+            Route("/alerts/active", self.active_alerts),
+            Route("/alerts/active/area/{state}", self.area_alerts),
+            Route("/points/{coordinates}", self.point),
+            Route("/gridpoints/{office}/{grid}/forecast", self.gridpoint_forecast),
+        ])
+
+    @staticmethod
+    def _load(replay_dir: str | None, name: str) -> dict | None:
+        if replay_dir is None or not os.path.exists(os.path.join(replay_dir, name)):
+            return None
+        with open(os.path.join(replay_dir, name)) as f:
+            return json.load(f)
+
+    async def _respond(self, route: str, payload: dict) -> Response:
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return Response("injected failure", status_code=503)
+        return JSONResponse(payload, media_type="application/geo+json")
+
+    async def active_alerts(self, request: Request) -> Response:
+        return await self._respond("alerts", self.alerts)
+
+    async def area_alerts(self, request: Request) -> Response:
+        state = request.path_params["state"].upper()
+        features = [
+            feature for feature in self.alerts["features"]
+            if any(code.startswith(state) for code in feature["properties"].get("geocode", {}).get("UGC", []))
+        ]
+        return await self._respond("alerts_area", {"type": "FeatureCollection", "features": features})
+
+    async def point(self, request: Request) -> Response:
+        latitude, longitude = request.path_params["coordinates"].split(",")
+        # One grid cell per whole degree, so nearby locations share a forecast
+        grid = f"{int(float(latitude))},{int(float(longitude))}"
+        forecast_url = str(request.base_url).rstrip("/") + f"/gridpoints/FAKE/{grid}/forecast"
+        payload = json.loads(json.dumps(self.points)) if self.points else {"properties": {}}
+        payload["properties"]["forecast"] = forecast_url
+        return await self._respond("points", payload)
+
+    async def gridpoint_forecast(self, request: Request) -> Response:
+        return await self._respond("forecast", self.forecast)
+
+    @asynccontextmanager
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> AsyncIterator[str]:
+        """Run the fake server in the background and yield its base URL."""
+        server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        task = asyncio.create_task(server.serve())
+        while not server.started:
+            if task.done():
+                task.result()
+            await asyncio.sleep(0.01)
+        bound_port = server.servers[0].sockets[0].getsockname()[1]
+        try:
+            yield f"http://{host}:{bound_port}"
+        finally:
+            server.should_exit = True
+            await task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake NWS API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--replay", help="directory with alerts.json, points.json, forecast.json")
+    parser.add_argument("--alerts-per-state", type=int, default=5)
+    args = parser.parse_args()
+
+    fake = FakeNWS(args.latency_ms / 1000, args.error_rate, args.replay, args.alerts_per_state)
+    uvicorn.run(fake.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Cache of NWS /points lookups: rounded coordinates -> forecast URL."""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def default_db_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "weather-mcp", "gridpoints.sqlite3")
+
+
+@dataclass
+class GridPointStats:
+    """Hit/miss counters of the grid point cache."""
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class GridPointCache:
+    """Two-level (LRU in memory, SQLite on disk) cache of forecast URLs.
+
+    A location maps to a forecast office and grid cell that almost never
+    change, so a warm `get_forecast` can skip the /points round trip.
+    Pass `path=None` to keep the cache in memory only.
+
+    SQLite runs in worker threads, off the event loop. Writes are queued
+    and committed together, so a batch of forecasts costs one commit. If
+    the database can't be opened or used, the cache goes on in memory only.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 1024,
+                 ttl: float = 7 * 24 * 3600, precision: int = 4):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        self.stats = GridPointStats()
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        # Serializes use of the connection by the worker threads
+        self._db_lock = threading.Lock()
+        self._db_failed = False
+        self._pending: dict[str, tuple[str, float]] = {}
+        self._writer: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "GridPointCache":
+        """Configure the cache from WEATHER_GRIDPOINT_* environment variables.
+
+        An empty WEATHER_GRIDPOINT_DB disables the on-disk level.
+        """
+        path = os.environ.get("WEATHER_GRIDPOINT_DB", default_db_path())
+        return cls(
+            path=path or None,
+            max_entries=env_int("WEATHER_GRIDPOINT_MAX_ENTRIES", 1024),
+            ttl=env_float("WEATHER_GRIDPOINT_TTL", 7 * 24 * 3600),
+        )
+
+    def key(self, latitude: float, longitude: float) -> str:
+        """Coordinates rounded to the precision NWS accepts for /points."""
+        return f"{latitude:.{self.precision}f},{longitude:.{self.precision}f}"
+
+    async def get(self, latitude: float, longitude: float) -> str | None:
+        key = self.key(latitude, longitude)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        elif self._disk_enabled:
+            entry = await asyncio.to_thread(self._with_db, self._load, key)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self._remember(key, entry)
+
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        forecast_url, stored_at = entry
+        if now - stored_at > self.ttl:
+            self.stats.expired += 1
+            self.stats.misses += 1
+            self._memory.pop(key, None)
+            return None
+
+        self.stats.hits += 1
+        return forecast_url
+
+    def put(self, latitude: float, longitude: float, forecast_url: str) -> None:
+        """Remember a forecast URL; the disk write is queued for the background writer."""
+        key = self.key(latitude, longitude)
+        entry = (forecast_url, time.time())
+        self._remember(key, entry)
+        if self._disk_enabled:
+            self._pending[key] = entry
+            if self._writer is None:
+                self._writer = asyncio.create_task(self._write_pending())
+
+    def close(self) -> None:
+        """Write what is still queued and close the database."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            self._with_db(self._store, pending)
+        with self._db_lock:
+            if self._db is not None:
+                db, self._db = self._db, None
+                db.close()
+
+    @property
+    def _disk_enabled(self) -> bool:
+        return self.path is not None and not self._db_failed
+
+    async def _write_pending(self) -> None:
+        try:
+            # Let the other lookups of a batch queue their writes first
+            await asyncio.sleep(0)
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                await asyncio.to_thread(self._with_db, self._store, pending)
+        finally:
+            if self._writer is asyncio.current_task():
+                self._writer = None
+
+    def _remember(self, key: str, entry: tuple[str, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _with_db(self, operation, *args):
+        """Run `operation(db, *args)`; a database error turns the disk level off."""
+        with self._db_lock:
+            if not self._disk_enabled:
+                return None
+            try:
+                return operation(self._connect(), *args)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("Grid point database %s failed, caching in memory only: %s", self.path, e)
+                self._db_failed = True
+                if self._db is not None:
+                    db, self._db = self._db, None
+                    db.close()
+                return None
+
+    @staticmethod
+    def _load(db: sqlite3.Connection, key: str) -> tuple[str, float] | None:
+        row = db.execute(
+            "SELECT forecast_url, stored_at FROM gridpoints WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    @staticmethod
+    def _store(db: sqlite3.Connection, entries: dict[str, tuple[str, float]]) -> None:
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO gridpoints (key, forecast_url, stored_at) VALUES (?, ?, ?)",
+                [(key, *entry) for key, entry in entries.items()],
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Used from worker threads, one at a time under _db_lock
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS gridpoints "
+                "(key TEXT PRIMARY KEY, forecast_url TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+        return self._db
@@ -0,0 +1,156 @@
+"""Shared HTTP connection pool for upstream NWS API calls."""
+import logging
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolSettings:
+    """Limits and timeouts of the shared connection pool."""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """Read pool settings from WEATHER_HTTP_* environment variables."""
+        return cls(
+            max_connections=env_int("WEATHER_HTTP_MAX_CONNECTIONS", cls.max_connections),
+            max_keepalive_connections=env_int("WEATHER_HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections),
+            keepalive_expiry=env_float("WEATHER_HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            timeout=env_float("WEATHER_HTTP_TIMEOUT", cls.timeout),
+            connect_timeout=env_float("WEATHER_HTTP_CONNECT_TIMEOUT", cls.connect_timeout),
+            http2=env_bool("WEATHER_HTTP2", cls.http2),
+        )
+
+
+@dataclass
+class PoolStats:
+    """Counters of the shared connection pool."""
+    requests: int = 0
+    new_connections: int = 0
+    queued: int = 0
+    queue_wait_seconds: float = 0.0
+    errors: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused": self.reused,
+            "reuse_ratio": round(self.reuse_ratio, 3),
+            "queued": self.queued,
+            "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+            "errors": self.errors,
+        }
+
+
+class HTTPPool:
+    """One keep-alive `httpx.AsyncClient` shared by every NWS request.
+
+    The client is created on first use and closed by `aclose`, so the
+    server lifespan owns the connections. Creating it imports the transport
+    and loads the TLS certificates, which is left out of server startup.
+    """
+
+    def __init__(self, settings: PoolSettings | None = None,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        self.settings = settings or PoolSettings()
+        self.transport = transport
+        self.stats = PoolStats()
+        self._client: httpx.AsyncClient | None = None
+        self._in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> httpx.AsyncClient:
+        settings = self.settings
+        limits = httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(settings.timeout, connect=settings.connect_timeout)
+        try:
+            return httpx.AsyncClient(limits=limits, timeout=timeout,
+                                     http2=settings.http2, transport=self.transport)
+        except ImportError:
+            # http2=True needs the optional "h2" package (httpx[http2])
+            logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+            return httpx.AsyncClient(limits=limits, timeout=timeout, transport=self.transport)
+
+    async def get(self, url: str, headers: dict[str, str] | None = None) -> httpx.Response:
+        """Send a GET through the shared client, recording pool statistics."""
+        with self._track() as extensions:
+            return await self.client.get(url, headers=headers, extensions=extensions)
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: dict[str, str] | None = None) -> AsyncIterator[httpx.Response]:
+        """Like `get`, but the caller reads the body while it is downloaded."""
+        with self._track() as extensions:
+            async with self.client.stream("GET", url, headers=headers, extensions=extensions) as response:
+                yield response
+
+    @contextmanager
+    def _track(self) -> Iterator[dict[str, Any]]:
+        stats = self.stats
+        stats.requests += 1
+        queued = self._in_flight >= self.settings.max_connections
+        if queued:
+            stats.queued += 1
+        started = time.perf_counter()
+        waiting = True
+
+        async def trace(event_name: str, info: dict) -> None:
+            # The first connection-level event marks the end of any pool wait
+            nonlocal waiting
+            if waiting:
+                waiting = False
+                if queued:
+                    stats.queue_wait_seconds += time.perf_counter() - started
+            if event_name == "connection.connect_tcp.started":
+                stats.new_connections += 1
+
+        self._in_flight += 1
+        try:
+            yield {"trace": trace}
+        except httpx.TransportError:
+            stats.errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def __aenter__(self) -> "HTTPPool":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -0,0 +1,129 @@
+"""Projected parsing of NWS GeoJSON responses.
+
+The tools only read a handful of properties, while national alert payloads
+are several megabytes, mostly `geometry` and unused text. A projection
+builds just the fields a tool needs. With the optional `ijson` package
+(`uv sync --extra streaming`) the body is parsed incrementally while it
+is downloaded and nothing else is materialized; without it the body is
+decoded in full and then projected, so the result is the same either way.
+"""
+from collections.abc import AsyncIterator
+from types import ModuleType
+
+import httpx
+
+# `ijson` once imported, None if it isn't installed
+_ijson: ModuleType | None = None
+_ijson_checked = False
+
+
+def load_ijson() -> ModuleType | None:
+    """The optional `ijson`, imported on the first parse rather than at startup."""
+    global _ijson, _ijson_checked
+    if not _ijson_checked:
+        try:
+            import ijson
+            _ijson = ijson
+        except ImportError:
+            pass
+        _ijson_checked = True
+    return _ijson
+
+
+class AsyncByteReader:
+    """File-like `read` over an async byte iterator, as `ijson` expects."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b""
+        try:
+            return await anext(self._chunks)
+        except StopAsyncIteration:
+            return b""
+
+
+class Projection:
+    """Subset of a response document that a tool needs.
+
+    `prefix` names the repeated items (in `ijson` prefix notation) the
+    projection is built from; everything outside them is skipped by the
+    parser without being materialized.
+    """
+    name = ""
+    prefix = ""
+
+    def project(self, document: dict) -> dict:
+        """Project an already decoded document."""
+        raise NotImplementedError
+
+    async def collect(self, items: AsyncIterator[dict]) -> dict:
+        """Build the projected document from the streamed `prefix` items."""
+        raise NotImplementedError
+
+    async def parse(self, response: httpx.Response) -> dict:
+        """Parse a streamed response; the caller closes it afterwards."""
+        ijson = load_ijson()
+        if ijson is None:
+            await response.aread()
+            return self.project(response.json())
+        reader = AsyncByteReader(response.aiter_bytes())
+        return await self.collect(ijson.items_async(reader, self.prefix, use_float=True))
+
+
+class AlertsProjection(Projection):
+    """`id`, the properties used by `format_alert` and the UGC codes of
+    every feature; geometry and other properties are dropped."""
+    name = "alerts"
+    # NWS repeats the alert id in properties.id, so geometry can be skipped. Both
+    # parsing paths take it from there: the feature id is a URL of the same alert.
+    prefix = "features.item.properties"
+    properties = ("id", "event", "areaDesc", "severity", "description", "instruction")
+
+    def project(self, document: dict) -> dict:
+        return {"features": [
+            self.project_properties(feature.get("properties", {}))
+            for feature in document.get("features", [])
+        ]}
+
+    async def collect(self, items: AsyncIterator[dict]) -> dict:
+        return {"features": [self.project_properties(props) async for props in items]}
+
+    def project_properties(self, props: dict) -> dict:
+        projected = {name: props[name] for name in self.properties if name in props}
+        projected["geocode"] = {"UGC": props.get("geocode", {}).get("UGC", [])}
+        return {"id": props.get("id"), "properties": projected}
+
+
+class ForecastProjection(Projection):
+    """The first `limit` forecast periods (all of them if `limit` isn't
+    positive); parsing stops once they are read."""
+    prefix = "properties.periods.item"
+    fields = ("name", "temperature", "temperatureUnit", "windSpeed",
+              "windDirection", "shortForecast", "detailedForecast")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.name = f"forecast:{limit}"
+
+    def project(self, document: dict) -> dict:
+        periods = document["properties"]["periods"]
+        if self.limit and self.limit > 0:
+            periods = periods[:self.limit]
+        return {"properties": {"periods": [self.project_period(period) for period in periods]}}
+
+    async def collect(self, items: AsyncIterator[dict]) -> dict:
+        periods = []
+        async for period in items:
+            periods.append(self.project_period(period))
+            if self.limit and 0 < self.limit <= len(periods):
+                break
+        return {"properties": {"periods": periods}}
+
+    def project_period(self, period: dict) -> dict:
+        return {name: period[name] for name in self.fields if name in period}
+
+
+ALERTS = AlertsProjection()
@@ -0,0 +1,111 @@
+"""Lightweight records for alerts and forecast periods.
+
+Records hold only the fields the tools report and render either the
+readable text the tools always returned or a compact dict with short keys
+for structured output.
+"""
+from typing import Any
+
+
+def clip(text: str | None, limit: int) -> str | None:
+    """Truncate `text` to `limit` characters; a limit of 0 omits it."""
+    if not text or limit <= 0:
+        return None
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+
+def compact_dict(**fields: Any) -> dict[str, Any]:
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+class AlertRecord:
+    __slots__ = ("id", "event", "area", "severity", "description", "instruction", "_text")
+
+    def __init__(self, id: str | None, event: str | None, area: str | None, severity: str | None,
+                 description: str | None, instruction: str | None):
+        self.id = id
+        self.event = event
+        self.area = area
+        self.severity = severity
+        self.description = description
+        self.instruction = instruction
+        self._text = None
+
+    @classmethod
+    def from_feature(cls, feature: dict) -> "AlertRecord":
+        props = feature["properties"]
+        return cls(
+            id=feature.get("id") or props.get("id"),
+            event=props.get("event"),
+            area=props.get("areaDesc"),
+            severity=props.get("severity"),
+            description=props.get("description"),
+            instruction=props.get("instruction"),
+        )
+
+    def text(self) -> str:
+        """Readable multi-line form, rendered once per record."""
+        if self._text is None:
+            self._text = f"""
+Event: {self.event or 'Unknown'}
+Area: {self.area or 'Unknown'}
+Severity: {self.severity or 'Unknown'}
+Description: {self.description or 'No description available'}
+Instructions: {self.instruction or 'No specific instructions provided'}
+"""
+        return self._text
+
+    def compact(self, max_text: int) -> dict[str, Any]:
+        return compact_dict(
+            ev=self.event,
+            sev=self.severity,
+            area=self.area,
+            desc=clip(self.description, max_text),
+            inst=clip(self.instruction, max_text),
+        )
+
+
+class PeriodRecord:
+    __slots__ = ("name", "temperature", "unit", "wind_speed", "wind_direction", "short", "detailed")
+
+    def __init__(self, name: str, temperature: float | None, unit: str | None, wind_speed: str | None,
+                 wind_direction: str | None, short: str | None, detailed: str | None):
+        self.name = name
+        self.temperature = temperature
+        self.unit = unit
+        self.wind_speed = wind_speed
+        self.wind_direction = wind_direction
+        self.short = short
+        self.detailed = detailed
+
+    @classmethod
+    def from_period(cls, period: dict) -> "PeriodRecord":
+        return cls(
+            name=period["name"],
+            temperature=period["temperature"],
+            unit=period["temperatureUnit"],
+            wind_speed=period["windSpeed"],
+            wind_direction=period["windDirection"],
+            short=period.get("shortForecast"),
+            detailed=period["detailedForecast"],
+        )
+
+    def text(self) -> str:
+        return f"""
+{self.name}:
+Temperature: {self.temperature}°{self.unit}
+Wind: {self.wind_speed} {self.wind_direction}
+Forecast: {self.detailed}
+"""
+
+    def compact(self, max_text: int) -> dict[str, Any]:
+        return compact_dict(
+            n=self.name,
+            t=self.temperature,
+            u=self.unit,
+            w=f"{self.wind_speed} {self.wind_direction}",
+            f=self.short,
+            d=clip(self.detailed, max_text),
+        )
@@ -0,0 +1,218 @@
+"""HTTP response cache for NWS GET requests.
+
+Decoded JSON bodies are kept per URL and reused while fresh according to
+`Cache-Control`/`Expires`. Stale entries are revalidated with
+`If-None-Match`/`If-Modified-Since`, so an unchanged document costs a 304
+and no re-parse, and within the stale-while-revalidate window the stale
+body is served at once while a background task refreshes it. Concurrent
+requests for a URL that is already being fetched share that fetch.
+
+Responses fetched with a `Projection` are parsed while streaming and cached
+per URL and projection.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+from config import env_float, env_int
+from http_pool import HTTPPool
+from projection import Projection
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    data: Any
+    etag: str | None
+    last_modified: str | None
+    fresh_until: float
+    stale_until: float
+
+
+@dataclass
+class CacheStats:
+    """Counters of the response cache."""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    refreshes: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def parse_http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_cache_control(value: str | None) -> dict[str, str | None]:
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+class ResponseCache:
+    """TTL + conditional revalidation cache in front of `HTTPPool.get`."""
+
+    def __init__(self, pool: HTTPPool, max_entries: int = 256,
+                 default_ttl: float = 0.0, stale_while_revalidate: float = 30.0):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stats = CacheStats()
+        self.inflight = SingleFlight()
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_env(cls, pool: HTTPPool) -> "ResponseCache":
+        """Configure the cache from WEATHER_CACHE_* environment variables.
+
+        WEATHER_CACHE_MAX_ENTRIES=0 disables caching.
+        """
+        return cls(
+            pool,
+            max_entries=env_int("WEATHER_CACHE_MAX_ENTRIES", 256),
+            default_ttl=env_float("WEATHER_CACHE_DEFAULT_TTL", 0.0),
+            stale_while_revalidate=env_float("WEATHER_CACHE_STALE_WHILE_REVALIDATE", 30.0),
+        )
+
+    async def fetch(self, url: str, headers: dict[str, str], projection: Projection | None = None,
+                    revalidate: bool = False) -> Any:
+        """Return the decoded (or projected) JSON body of `url`, from cache
+        when possible.
+
+        With `revalidate` a stale entry is revalidated before it is returned
+        instead of being served while it is refreshed in the background.
+
+        Raises `httpx.HTTPError` (or a JSON decode error) on failure, like an
+        uncached request would.
+        """
+        key = f"{url}#{projection.name}" if projection else url
+        if self.max_entries <= 0:
+            return await self.inflight.do(key, lambda: self._get(url, headers, projection))
+
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self.stats.hits += 1
+                return entry.data
+            if now < entry.stale_until and not revalidate:
+                self.stats.stale_hits += 1
+                self._refresh_in_background(key, url, headers, projection, entry)
+                return entry.data
+
+        self.stats.misses += 1
+        return await self.inflight.do(key, lambda: self._revalidate(key, url, headers, projection, entry))
+
+    async def aclose(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refreshing.clear()
+
+    async def _get(self, url: str, headers: dict[str, str], projection: Projection | None) -> Any:
+        async with self.pool.stream(url, headers=headers) as response:
+            response.raise_for_status()
+            return await self._parse(response, projection)
+
+    async def _parse(self, response: httpx.Response, projection: Projection | None) -> Any:
+        if projection is not None:
+            return await projection.parse(response)
+        await response.aread()
+        return response.json()
+
+    def _refresh_in_background(self, key: str, url: str, headers: dict[str, str],
+                               projection: Projection | None, entry: CacheEntry) -> None:
+        if key in self._refreshing:
+            return
+        self.stats.refreshes += 1
+        task = asyncio.create_task(self._revalidate(key, url, headers, projection, entry))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: self._refresh_done(key, t))
+
+    def _refresh_done(self, key: str, task: asyncio.Task) -> None:
+        self._refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background refresh of %s failed: %s", key, task.exception())
+
+    async def _revalidate(self, key: str, url: str, headers: dict[str, str],
+                          projection: Projection | None, entry: CacheEntry | None) -> Any:
+        request_headers = dict(headers)
+        if entry is not None:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+
+        async with self.pool.stream(url, headers=request_headers) as response:
+            if response.status_code == 304 and entry is not None:
+                self.stats.revalidated += 1
+                data = entry.data
+            else:
+                response.raise_for_status()
+                data = await self._parse(response, projection)
+
+        self._store(key, data, response, entry)
+        return data
+
+    def _store(self, key: str, data: Any, response: httpx.Response, previous: CacheEntry | None) -> None:
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        if "no-store" in directives or "private" in directives:
+            self._entries.pop(key, None)
+            return
+
+        ttl = self._freshness_lifetime(response, directives)
+        swr = directives.get("stale-while-revalidate")
+        swr = float(swr) if swr and swr.isdigit() else self.stale_while_revalidate
+        if "no-cache" in directives:
+            # Must be revalidated before every use, so never served stale
+            swr = 0.0
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(
+            data=data,
+            etag=response.headers.get("ETag") or (previous.etag if previous else None),
+            last_modified=response.headers.get("Last-Modified") or (previous.last_modified if previous else None),
+            fresh_until=now + ttl,
+            stale_until=now + ttl + swr,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _freshness_lifetime(self, response: httpx.Response, directives: dict[str, str | None]) -> float:
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            value = directives.get(name)
+            if value is not None and value.isdigit():
+                age = response.headers.get("Age", "0")
+                return max(float(value) - (float(age) if age.isdigit() else 0.0), 0.0)
+        expires = parse_http_date(response.headers.get("Expires"))
+        if expires is not None:
+            date = parse_http_date(response.headers.get("Date")) or time.time()
+            return max(expires - date, 0.0)
+        return self.default_ttl
@@ -0,0 +1,65 @@
+"""Coalescing of concurrent identical upstream requests."""
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    """How many calls did the work and how many shared another call's result."""
+    leaders: int = 0
+    collapsed: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"leaders": self.leaders, "collapsed": self.collapsed}
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one `fn` per key at a time; other callers await its result.
+
+    Every caller gets the same result object (or the same exception), so
+    results must be treated as read-only. A cancelled caller only stops
+    waiting; the shared call is cancelled once nobody waits for it anymore,
+    and a caller arriving after that starts a new one.
+    """
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._calls: dict[str, _Call] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None or call.task.done() or call.task.cancelling():
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.stats.leaders += 1
+        else:
+            self.stats.collapsed += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                # Don't let a new caller join the call before its done callback runs
+                self._forget(key, call)
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
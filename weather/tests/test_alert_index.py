@@ -0,0 +1,30 @@
+import asyncio
+import unittest
+
+from alert_index import AlertIndex
+from tracing import Metrics, Tracer
+
+
+class AlertIndexTest(unittest.IsolatedAsyncioTestCase):
+    async def test_polls_are_not_traced_as_part_of_the_request_which_started_them(self):
+        tracer = Tracer(Metrics("test"))
+        polled = asyncio.Event()
+        spans = []
+
+        async def fetch(url):
+            with tracer.span("upstream") as span:
+                spans.append(span)
+            polled.set()
+            return {"features": []}
+
+        async with AlertIndex("https://api.weather.gov/alerts/active", fetch, interval=60) as index:
+            with tracer.span("tool") as request:
+                index.start()
+            await polled.wait()
+
+        self.assertIsNone(spans[0].parent_id)
+        self.assertNotEqual(spans[0].trace_id, request.trace_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
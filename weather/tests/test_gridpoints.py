@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from gridpoints import GridPointCache
+
+URL = "https://api.weather.gov/gridpoints/MTR/85,105/forecast"
+
+
+class GridPointCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "gridpoints.sqlite3")
+
+    def cache(self, path) -> GridPointCache:
+        cache = GridPointCache(path)
+        self.addCleanup(cache.close)
+        return cache
+
+    async def test_memory_only_cache(self):
+        cache = self.cache(None)
+        self.assertIsNone(await cache.get(37.0, -122.0))
+        cache.put(37.0, -122.0, URL)
+
+        self.assertIsNone(cache._writer)
+        self.assertEqual(await cache.get(37.0, -122.0), URL)
+        self.assertEqual(cache.stats.as_dict()["hits"], 1)
+
+    async def test_puts_are_written_to_disk_in_the_background(self):
+        cache = self.cache(self.path)
+        for i in range(5):
+            cache.put(37.0 + i, -122.0, f"{URL}?{i}")
+        await cache._writer
+        self.assertEqual(cache._db.total_changes, 5)
+
+        restarted = self.cache(self.path)
+        self.assertEqual(await restarted.get(41.0, -122.0), f"{URL}?4")
+        self.assertEqual(restarted.stats.disk_hits, 1)
+
+    async def test_queued_writes_are_flushed_on_close(self):
+        cache = GridPointCache(self.path)
+        cache.put(37.0, -122.0, URL)
+        cache.close()
+
+        self.assertEqual(await self.cache(self.path).get(37.0, -122.0), URL)
+
+    async def test_unusable_database_falls_back_to_memory(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a database" * 100)
+        cache = self.cache(self.path)
+
+        with self.assertLogs("gridpoints", "WARNING"):
+            self.assertIsNone(await cache.get(37.0, -122.0))
+        cache.put(37.0, -122.0, URL)
+        await asyncio.sleep(0)
+
+        self.assertIsNone(cache._writer)
+        self.assertEqual(await cache.get(37.0, -122.0), URL)
+
+    async def test_unwritable_directory_falls_back_to_memory(self):
+        blocker = os.path.join(os.path.dirname(self.path), "file")
+        open(blocker, "w").close()
+        cache = self.cache(os.path.join(blocker, "gridpoints.sqlite3"))
+
+        with self.assertLogs("gridpoints", "WARNING"):
+            cache.put(37.0, -122.0, URL)
+            await cache._writer
+        self.assertEqual(await cache.get(37.0, -122.0), URL)
+
+
+if __name__ == "__main__":
+    unittest.main()
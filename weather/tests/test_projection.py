@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+import httpx
+
+import projection
+from projection import ALERTS, ForecastProjection
+
+ALERT_ID = "urn:oid:2.49.0.1.840.0.1"
+ALERTS_DOCUMENT = {"features": [{
+    "id": f"https://api.weather.gov/alerts/{ALERT_ID}",
+    "geometry": {"type": "Polygon", "coordinates": [[[-100.0, 35.0], [-100.1, 35.0]]]},
+    "properties": {"id": ALERT_ID, "event": "Flood Warning", "areaDesc": "Somewhere",
+                   "geocode": {"UGC": ["CAZ001"]}, "sent": "2026-10-18T00:00:00Z"},
+}]}
+FORECAST_DOCUMENT = {"properties": {"periods": [
+    {"name": f"Period {i}", "temperature": 60 + i, "icon": "unused"} for i in range(1, 5)
+]}}
+
+
+class ProjectionTest(unittest.IsolatedAsyncioTestCase):
+    """Every projection parsed from a streamed response, with `ijson` and with the full decode."""
+
+    async def parse(self, proj, document, streaming: bool) -> dict:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=document))
+        ijson = projection.load_ijson() if streaming else None
+        if streaming and ijson is None:
+            self.skipTest("ijson is not installed")
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://api.weather.gov/") as response:
+                with mock.patch("projection.load_ijson", return_value=ijson):
+                    return await proj.parse(response)
+
+    async def test_both_paths_give_the_same_alerts(self):
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                alerts = await self.parse(ALERTS, ALERTS_DOCUMENT, streaming)
+                self.assertEqual(alerts, {"features": [{"id": ALERT_ID, "properties": {
+                    "id": ALERT_ID, "event": "Flood Warning", "areaDesc": "Somewhere",
+                    "geocode": {"UGC": ["CAZ001"]},
+                }}]})
+
+    async def test_forecast_limit(self):
+        for limit, count in ((2, 2), (10, 4), (0, 4), (-1, 4)):
+            for streaming in (False, True):
+                with self.subTest(limit=limit, streaming=streaming):
+                    forecast = await self.parse(ForecastProjection(limit), FORECAST_DOCUMENT, streaming)
+                    periods = forecast["properties"]["periods"]
+                    self.assertEqual([period["name"] for period in periods],
+                                     [f"Period {i}" for i in range(1, count + 1)])
+                    self.assertNotIn("icon", periods[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+
+from http_pool import HTTPPool
+from response_cache import ResponseCache
+
+BASE = "https://api.weather.gov"
+
+
+class ResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+    """The cache in front of a mock NWS API; `headers` are the response headers it sends."""
+
+    async def asyncSetUp(self):
+        self.now = 1000.0
+        clock = mock.patch("response_cache.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+        self.headers = {"Cache-Control": "max-age=60"}
+        self.requests: list[httpx.Request] = []
+        self.pool = HTTPPool(transport=httpx.MockTransport(self.respond))
+        self.addAsyncCleanup(self.pool.aclose)
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if "ETag" in self.headers and request.headers.get("If-None-Match") == self.headers["ETag"]:
+            return httpx.Response(304, headers=self.headers)
+        return httpx.Response(200, headers=self.headers, json={"path": request.url.path, "n": len(self.requests)})
+
+    def cache(self, **kwargs) -> ResponseCache:
+        cache = ResponseCache(self.pool, **kwargs)
+        self.addAsyncCleanup(cache.aclose)
+        return cache
+
+    async def fetch(self, cache: ResponseCache, path: str = "/alerts") -> dict:
+        return await cache.fetch(BASE + path, {})
+
+    async def test_fresh_response_is_served_until_max_age(self):
+        cache = self.cache(stale_while_revalidate=0)
+        first = await self.fetch(cache)
+        self.now += 59
+        self.assertIs(await self.fetch(cache), first)
+        self.assertEqual(len(self.requests), 1)
+
+        self.now += 2
+        self.assertEqual((await self.fetch(cache))["n"], 2)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 2)
+
+    async def test_stale_response_is_revalidated_with_its_etag(self):
+        self.headers = {"Cache-Control": "max-age=0", "ETag": '"v1"'}
+        cache = self.cache(stale_while_revalidate=0)
+        first = await self.fetch(cache)
+
+        self.assertIs(await self.fetch(cache), first)
+        self.assertEqual(self.requests[1].headers["If-None-Match"], '"v1"')
+        self.assertEqual(cache.stats.revalidated, 1)
+
+    async def test_stale_response_is_served_while_it_is_refreshed(self):
+        self.headers = {"Cache-Control": "max-age=10, stale-while-revalidate=30"}
+        cache = self.cache()
+        first = await self.fetch(cache)
+
+        self.now += 15
+        self.assertIs(await self.fetch(cache), first)
+        self.assertEqual(cache.stats.stale_hits, 1)
+        await asyncio.gather(*cache._refreshing.values())
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual((await self.fetch(cache))["n"], 2)
+        self.assertEqual(cache.stats.hits, 1)
+
+    async def test_revalidate_skips_the_stale_while_revalidate_window(self):
+        self.headers = {"Cache-Control": "max-age=10, stale-while-revalidate=30"}
+        cache = self.cache()
+        await self.fetch(cache)
+
+        self.now += 15
+        self.assertEqual((await cache.fetch(BASE + "/alerts", {}, revalidate=True))["n"], 2)
+        self.assertEqual(cache.stats.stale_hits, 0)
+        self.assertEqual(cache._refreshing, {})
+
+    async def test_stale_response_past_the_window_is_fetched_again(self):
+        self.headers = {"Cache-Control": "max-age=10, stale-while-revalidate=30"}
+        cache = self.cache()
+        await self.fetch(cache)
+
+        self.now += 41
+        self.assertEqual((await self.fetch(cache))["n"], 2)
+        self.assertEqual(cache.stats.stale_hits, 0)
+
+    async def test_no_cache_response_is_revalidated_before_every_use(self):
+        self.headers = {"Cache-Control": "no-cache", "ETag": '"v1"'}
+        cache = self.cache(stale_while_revalidate=30)
+        first = await self.fetch(cache)
+
+        self.now += 1
+        self.assertIs(await self.fetch(cache), first)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(cache.stats.stale_hits, 0)
+        self.assertEqual(cache.stats.revalidated, 1)
+
+    async def test_no_store_and_private_responses_are_not_cached(self):
+        for cache_control in ("no-store", "private, max-age=60"):
+            with self.subTest(cache_control):
+                self.requests.clear()
+                self.headers = {"Cache-Control": cache_control}
+                cache = self.cache()
+                await self.fetch(cache)
+                await self.fetch(cache)
+
+                self.assertEqual(len(self.requests), 2)
+                self.assertEqual(cache._entries, {})
+
+    async def test_least_recently_used_entry_is_evicted(self):
+        cache = self.cache(max_entries=2)
+        await self.fetch(cache, "/a")
+        await self.fetch(cache, "/b")
+        await self.fetch(cache, "/a")
+        await self.fetch(cache, "/c")
+        self.assertEqual(cache.stats.evictions, 1)
+
+        await self.fetch(cache, "/a")
+        self.assertEqual(len(self.requests), 3)
+        await self.fetch(cache, "/b")
+        self.assertEqual([request.url.path for request in self.requests], ["/a", "/b", "/c", "/b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
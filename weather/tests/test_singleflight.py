@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        await self.release.wait()
+        return {"calls": self.calls}
+
+    async def test_concurrent_callers_share_one_call(self):
+        callers = [asyncio.create_task(self.flight.do("url", self.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*callers)
+
+        self.assertEqual(self.calls, 1)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(self.flight.stats.as_dict(), {"leaders": 1, "collapsed": 2})
+
+    async def test_error_is_shared_by_all_waiters(self):
+        async def fail():
+            self.calls += 1
+            await self.release.wait()
+            raise ValueError("upstream failed")
+
+        callers = [asyncio.create_task(self.flight.do("url", fail)) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        self.assertEqual(self.calls, 1)
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIs(results[0], results[1])
+
+    async def test_cancelled_caller_leaves_the_call_to_the_others(self):
+        first = asyncio.create_task(self.flight.do("url", self.fetch))
+        second = asyncio.create_task(self.flight.do("url", self.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await second, {"calls": 1})
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_call_is_cancelled_with_its_last_waiter(self):
+        caller = asyncio.create_task(self.flight.do("url", self.fetch))
+        await asyncio.sleep(0)
+        task = self.flight._calls["url"].task
+        caller.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+        self.assertTrue(task.cancelled())
+        self.assertNotIn("url", self.flight._calls)
+
+    async def test_caller_after_the_last_waiter_was_cancelled_starts_a_new_call(self):
+        caller = asyncio.create_task(self.flight.do("url", self.fetch))
+        await asyncio.sleep(0)
+        caller.cancel()
+        # The cancelled caller has cancelled the shared call, which hasn't finished yet
+        await asyncio.sleep(0)
+
+        self.release.set()
+        self.assertEqual(await self.flight.do("url", self.fetch), {"calls": 2})
+        self.assertEqual(self.flight.stats.leaders, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
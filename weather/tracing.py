@@ -0,0 +1,224 @@
+"""Timed spans and latency histograms for tool calls and upstream requests.
+
+A span times one operation and continues the trace of its caller: the
+client sends a W3C `traceparent` in the `_meta` of its MCP request, spans
+opened while handling it (upstream requests) become its children. Ended
+spans are appended to a JSON lines file, and their durations are observed
+in histograms exported in the Prometheus text format.
+"""
+import json
+import os
+import secrets
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucket counts for export and the latest samples for percentiles."""
+
+    def __init__(self, samples: int = 1024):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=samples)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Latency histograms by operation name and labels."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def observe(self, name: str, seconds: float, labels: dict[str, str]) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Count and p50/p95 (in milliseconds, over the latest samples) per histogram."""
+        rows = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            samples = list(histogram.recent)
+            rows.append({
+                "name": name,
+                **dict(labels),
+                "count": histogram.count,
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            })
+        return rows
+
+    def prometheus(self) -> str:
+        lines = []
+        names = sorted({name for name, _ in self.histograms})
+        for name in names:
+            metric = f"{self.prefix}_{name}_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, labels), histogram in sorted(self.histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{{{_labels(labels, le=str(bound))}}} {cumulative}")
+                lines.append(f"{metric}_bucket{{{_labels(labels, le='+Inf')}}} {histogram.count}")
+                lines.append(f"{metric}_sum{{{_labels(labels)}}} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{{{_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Replace `path` atomically, e.g. for the node exporter textfile collector."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
+
+
+def _labels(labels: Labels, **extra: str) -> str:
+    items = list(labels) + list(extra.items())
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in items)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    labels: dict[str, str]
+    start: float = field(default_factory=time.time)
+    duration: float = 0.0
+    error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "error": self.error,
+            **self.labels,
+        }
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """(trace id, parent span id) of a W3C `traceparent` header value."""
+    parts = value.split("-") if value else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Opens spans and exports them; `metrics_path` is rewritten at most every `export_interval` seconds."""
+
+    def __init__(self, metrics: Metrics, span_log: str | None = None,
+                 metrics_path: str | None = None, export_interval: float = 10.0):
+        self.metrics = metrics
+        self.span_log = span_log
+        self.metrics_path = metrics_path
+        self.export_interval = export_interval
+        self._exported = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "Tracer":
+        return cls(
+            Metrics(prefix),
+            span_log=os.environ.get("WEATHER_SPAN_LOG") or None,
+            metrics_path=os.environ.get("WEATHER_METRICS_FILE") or None,
+        )
+
+    @contextmanager
+    def span(self, name: str, traceparent: str | None = None, **labels: str) -> Iterator[Span]:
+        """Time the body as a child of the current span, or of `traceparent` from another process."""
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if parent is None else None
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif remote is not None:
+            trace_id, parent_id = remote
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+
+        span = Span(name, trace_id, secrets.token_hex(8), parent_id, labels)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = span.error or type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._end(span)
+
+    def _end(self, span: Span) -> None:
+        self.metrics.observe(span.name, span.duration, span.labels)
+        if self.span_log:
+            with open(self.span_log, "a") as f:
+                f.write(json.dumps(span.as_dict(), separators=(",", ":")) + "\n")
+        if self.metrics_path and time.monotonic() - self._exported >= self.export_interval:
+            self.export()
+
+    def export(self) -> None:
+        if self.metrics_path:
+            self.metrics.write(self.metrics_path)
+            self._exported = time.monotonic()
+
+
+def upstream_route(url: str) -> str:
+    """Low-cardinality name of an NWS endpoint, for metric labels."""
+    path = urlsplit(url).path
+    if path.startswith("/alerts/active/area/"):
+        return "alerts_area"
+    if path.startswith("/alerts"):
+        return "alerts"
+    if path.startswith("/points/"):
+        return "points"
+    if path.endswith("/forecast"):
+        return "forecast"
+    return "other"
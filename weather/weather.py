@@ -1,95 +1,360 @@
+import argparse
+import asyncio
+import json
+import os
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
 from typing import Any
-import httpx
+import anyio
+import uvicorn
 from mcp.server.fastmcp import FastMCP
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-# Initialize FastMCP server
-mcp = FastMCP("weather")
+from alert_index import AlertIndex, alert_keys
+from config import env_float, env_int
+from gridpoints import GridPointCache
+from http_pool import HTTPPool, PoolSettings
+from projection import ALERTS, ForecastProjection, Projection
+from records import AlertRecord, PeriodRecord
+from response_cache import ResponseCache
+from tracing import Tracer, upstream_route
 
 # Constants
-NWS_API_BASE = "https://api.weather.gov"
+NWS_API_BASE = os.environ.get("NWS_API_BASE", "https://api.weather.gov")
 USER_AGENT = "weather-app/1.0"
+# Upstream requests one get_forecasts call may have in flight
+BATCH_CONCURRENCY = env_int("WEATHER_BATCH_CONCURRENCY", 8)
+# Default length of long text fields in compact tool output
+COMPACT_MAX_TEXT = 160
+# Seconds the SSE server waits for open sessions on shutdown before cancelling them
+SHUTDOWN_TIMEOUT = env_float("WEATHER_SHUTDOWN_TIMEOUT", 5.0)
+# Seconds between nationwide alert polls, 0 queries alerts per state instead
+ALERT_INDEX_INTERVAL = env_float("WEATHER_ALERT_INDEX_INTERVAL", 60.0)
 
-async def make_nws_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the NWS API with proper error handling."""
+# Shared keep-alive connection pool, opened and closed by the server lifespan
+http_pool = HTTPPool(PoolSettings.from_env())
+# Coordinates -> forecast URL, kept in memory and on disk across restarts
+gridpoints = GridPointCache.from_env()
+# Decoded NWS responses, reused while fresh and revalidated with ETag/Last-Modified
+response_cache = ResponseCache.from_env(http_pool)
+# Spans of tool calls and upstream requests, latency histograms by tool and route
+tracer = Tracer.from_env("weather")
+
+class SharedResources:
+    """Upstream connections and background polling, open while anybody uses them.
+
+    MCP enters the server lifespan once per session, so with the SSE
+    transport many sessions overlap: the first one opens the resources and
+    the last one closes them. The SSE app holds its own reference for its
+    whole lifetime, so they stay open (and caches warm) between sessions.
+    """
+
+    def __init__(self) -> None:
+        self.users = 0
+        self._lock = asyncio.Lock()
+        self._stack: AsyncExitStack | None = None
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            if self.users == 0:
+                async with AsyncExitStack() as stack:
+                    stack.callback(gridpoints.close)
+                    await stack.enter_async_context(http_pool)
+                    stack.push_async_callback(response_cache.aclose)
+                    await stack.enter_async_context(alert_index)
+                    stack.callback(tracer.export)
+                    self._stack = stack.pop_all()
+            self.users += 1
+
+    async def release(self) -> None:
+        async with self._lock:
+            self.users -= 1
+            if self.users == 0 and self._stack is not None:
+                stack, self._stack = self._stack, None
+                await stack.aclose()
+
+    @asynccontextmanager
+    async def use(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+
+shared_resources = SharedResources()
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Keep upstream connections and caches open for the lifetime of the server."""
+    async with shared_resources.use():
+        yield
+
+class TracedFastMCP(FastMCP):
+    """FastMCP which times every tool call, continuing the trace of the client's request."""
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+        try:
+            meta = self._mcp_server.request_context.meta
+        except LookupError:
+            meta = None
+        with tracer.span("tool", traceparent=getattr(meta, "traceparent", None), tool=name):
+            return await super().call_tool(name, arguments)
+
+# Initialize FastMCP server. Its per request INFO log is rendered to the client's stderr and
+# costs the first request a few milliseconds, so only warnings are logged unless asked for.
+mcp = TracedFastMCP("weather", lifespan=server_lifespan,
+                    log_level=os.environ.get("FASTMCP_LOG_LEVEL", "WARNING"))
+
+async def make_nws_request(url: str, projection: Projection | None = None,
+                           revalidate: bool = False) -> dict[str, Any] | None:
+    """Make a request to the NWS API with proper error handling.
+
+    With a `projection` only the fields it selects are parsed and returned.
+    With `revalidate` a stale cached response is never returned.
+    """
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/geo+json"
     }
-    async with httpx.AsyncClient() as client:
+    with tracer.span("upstream", route=upstream_route(url)) as span:
         try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
+            return await response_cache.fetch(url, headers, projection, revalidate)
+        except Exception as e:
+            span.error = type(e).__name__
             return None
 
-def format_alert(feature: dict) -> str:
-    """Format an alert feature into a readable string."""
-    props = feature["properties"]
-    return f"""
-Event: {props.get('event', 'Unknown')}
-Area: {props.get('areaDesc', 'Unknown')}
-Severity: {props.get('severity', 'Unknown')}
-Description: {props.get('description', 'No description available')}
-Instructions: {props.get('instruction', 'No specific instructions provided')}
-"""
+async def resolve_forecast_url(latitude: float, longitude: float) -> str | None:
+    """Map a location to its forecast URL, using the grid point cache."""
+    forecast_url = await gridpoints.get(latitude, longitude)
+    if forecast_url:
+        return forecast_url
+
+    points_url = f"{NWS_API_BASE}/points/{gridpoints.key(latitude, longitude)}"
+    points_data = await make_nws_request(points_url)
+
+    if not points_data:
+        return None
+
+    forecast_url = points_data["properties"]["forecast"]
+    gridpoints.put(latitude, longitude, forecast_url)
+    return forecast_url
+
+def matches_filters(keys: dict[str, tuple[str, ...]], filters: dict[str, str | None]) -> bool:
+    """Whether alert index keys match every given filter (case-insensitive)."""
+    return all(value.upper() in keys[key] for key, value in filters.items() if value)
+
+def render(records: list[AlertRecord] | list[PeriodRecord], compact: bool, max_text: int) -> str:
+    """Join records as readable text, or as compact JSON with short keys."""
+    if compact:
+        return json.dumps([record.compact(max_text) for record in records],
+                          separators=(",", ":"), ensure_ascii=False)
+    return "\n---\n".join(record.text() for record in records)
+
+# All active alerts, polled in the background (from the first get_alerts call on) and indexed
+# in memory. A poll must not get a stale response, the index would fall an interval behind.
+alert_index = AlertIndex(f"{NWS_API_BASE}/alerts/active",
+                         lambda url: make_nws_request(url, ALERTS, revalidate=True),
+                         interval=ALERT_INDEX_INTERVAL)
 
 @mcp.tool()
-async def get_alerts(state: str) -> str:
+async def get_alerts(state: str, severity: str | None = None, event: str | None = None,
+                     zone: str | None = None, compact: bool = False,
+                     max_text: int = COMPACT_MAX_TEXT) -> str:
     """Get weather alerts for a US state.
 
     Args:
         state: Two-letter US state code (e.g. CA, NY)
+        severity: Only alerts of this severity (Extreme, Severe, Moderate, Minor, Unknown)
+        event: Only alerts of this event type (e.g. Flood Warning)
+        zone: Only alerts for this UGC zone or county code (e.g. TXZ211)
+        compact: Return a compact JSON list (keys: ev, sev, area, desc, inst) instead of text
+        max_text: In compact mode, truncate descriptions to this many characters (0 omits them)
     """
-    url = f"{NWS_API_BASE}/alerts/active/area/{state}"
-    data = await make_nws_request(url)
+    filters = {"state": state, "severity": severity, "event": event, "zone": zone}
+
+    alert_index.start()
+    if alert_index.ready:
+        alerts = [alert.record for alert in alert_index.query(**filters)]
+    else:
+        url = f"{NWS_API_BASE}/alerts/active/area/{state}"
+        data = await make_nws_request(url, ALERTS)
 
-    if not data or "features" not in data:
-        return "Unable to fetch alerts or no alerts found."
+        if not data or "features" not in data:
+            return "Unable to fetch alerts or no alerts found."
 
-    if not data["features"]:
+        # The area query already selected the state
+        filters["state"] = None
+        alerts = [
+            AlertRecord.from_feature(feature) for feature in data["features"]
+            if matches_filters(alert_keys(feature["properties"]), filters)
+        ]
+
+    if not alerts:
         return "No active alerts for this state."
 
-    alerts = [format_alert(feature) for feature in data["features"]]
-    return "\n---\n".join(alerts)
+    return render(alerts, compact, max_text)
 
 @mcp.tool()
-async def get_forecast(latitude: float, longitude: float) -> str:
+async def get_forecast(latitude: float, longitude: float, max_periods: int = 5,
+                       compact: bool = False, max_text: int = COMPACT_MAX_TEXT) -> str:
     """Get weather forecast for a location.
 
     Args:
         latitude: Latitude of the location
         longitude: Longitude of the location
+        max_periods: Number of forecast periods to return
+        compact: Return a compact JSON list (keys: n, t, u, w, f, d) instead of text
+        max_text: In compact mode, truncate detailed forecasts to this many characters (0 omits them)
     """
-    # First get the forecast grid endpoint
-    points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    # First get the forecast grid endpoint (cached across calls)
+    forecast_url = await resolve_forecast_url(latitude, longitude)
 
-    if not points_data:
+    if not forecast_url:
         return "Unable to fetch forecast data for this location."
 
-    # Get the forecast URL from the points response
-    forecast_url = points_data["properties"]["forecast"]
-    forecast_data = await make_nws_request(forecast_url)
+    forecast_data = await make_nws_request(forecast_url, ForecastProjection(max_periods))
 
     if not forecast_data:
         return "Unable to fetch detailed forecast."
 
-    # Format the periods into a readable forecast
-    periods = forecast_data["properties"]["periods"]
-    forecasts = []
-    for period in periods[:5]:  # Only show next 5 periods
-        forecast = f"""
-{period['name']}:
-Temperature: {period['temperature']}°{period['temperatureUnit']}
-Wind: {period['windSpeed']} {period['windDirection']}
-Forecast: {period['detailedForecast']}
-"""
-        forecasts.append(forecast)
+    periods = [PeriodRecord.from_period(period) for period in forecast_data["properties"]["periods"]]
+    return render(periods, compact, max_text)
+
+class Location(BaseModel):
+    latitude: float
+    longitude: float
+
+@mcp.tool()
+async def get_forecasts(locations: list[Location], max_periods: int = 2) -> str:
+    """Get weather forecasts for many locations at once.
+
+    Locations in the same forecast grid cell are fetched only once, and a
+    failure for one location does not fail the others.
+
+    Args:
+        locations: Locations, each with latitude and longitude
+        max_periods: Number of forecast periods to show per location
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    projection = ForecastProjection(max_periods)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    # Resolve every distinct (rounded) location to its grid cell's forecast URL
+    unique = {gridpoints.key(loc.latitude, loc.longitude): loc for loc in locations}
+    resolved = await asyncio.gather(
+        *(limited(resolve_forecast_url(loc.latitude, loc.longitude)) for loc in unique.values()),
+        return_exceptions=True,
+    )
+    forecast_urls = {
+        key: url if isinstance(url, str) else None
+        for key, url in zip(unique, resolved)
+    }
+
+    # Fetch each grid cell's forecast once
+    grid_urls = list(dict.fromkeys(url for url in forecast_urls.values() if url))
+    fetched = await asyncio.gather(
+        *(limited(make_nws_request(url, projection)) for url in grid_urls),
+        return_exceptions=True,
+    )
+    forecasts = {}
+    for url, forecast_data in zip(grid_urls, fetched):
+        try:
+            forecasts[url] = render(
+                [PeriodRecord.from_period(period) for period in forecast_data["properties"]["periods"]],
+                compact=False, max_text=0,
+            )
+        except (KeyError, TypeError):
+            forecasts[url] = "Unable to fetch detailed forecast."
+
+    sections = []
+    for loc in locations:
+        key = gridpoints.key(loc.latitude, loc.longitude)
+        forecast_url = forecast_urls[key]
+        if forecast_url:
+            sections.append(f"Location {key}:\n{forecasts[forecast_url]}")
+        else:
+            sections.append(f"Location {key}:\nUnable to fetch forecast data for this location.")
+
+    return "\n===\n".join(sections)
 
-    return "\n---\n".join(forecasts)
+@mcp.resource("weather://stats")
+def get_stats() -> str:
+    """Connection pool and cache statistics of the weather server."""
+    return json.dumps({
+        "http_pool": http_pool.stats.as_dict(),
+        "gridpoints": gridpoints.stats.as_dict(),
+        "response_cache": response_cache.stats.as_dict(),
+        "singleflight": response_cache.inflight.stats.as_dict(),
+        "alert_index": alert_index.stats.as_dict(),
+        "latency": tracer.metrics.summary(),
+    }, indent=2)
+
+@mcp.resource("weather://metrics", mime_type="text/plain")
+def get_metrics() -> str:
+    """Latency histograms of tool calls and upstream requests, in the Prometheus text format."""
+    return tracer.metrics.prometheus()
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(tracer.metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def close_on_disconnect(app: ASGIApp) -> ASGIApp:
+    """Cancel a request once its client disconnects.
+
+    The MCP SSE transport keeps a session running after its event stream
+    is gone, so every finished session would hold its tasks (and block
+    server shutdown) forever.
+    """
+    async def wrapped(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await app(scope, receive, send)
+            return
+
+        async with anyio.create_task_group() as tg:
+            async def watched_receive():
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    tg.cancel_scope.cancel()
+                return message
+
+            await app(scope, watched_receive, send)
+
+    return wrapped
+
+
+def sse_app() -> ASGIApp:
+    """The MCP SSE app, serving any number of concurrent sessions from one process.
+
+    All sessions share the connection pool, caches and alert index, which
+    stay open from app startup to shutdown. Latency histograms are served
+    for Prometheus at `/metrics`.
+    """
+    app = mcp.sse_app()
+    app.router.lifespan_context = lambda app: shared_resources.use()
+    app.router.routes.append(Route("/metrics", metrics_endpoint))
+    return close_on_disconnect(app)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weather MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio",
+                        help="stdio (one client) or sse (concurrent clients over HTTP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
     # Initialize and run the server
-    mcp.run(transport='stdio')
+    if args.transport == "sse":
+        uvicorn.run(sse_app(), host=args.host, port=args.port, log_level="warning",
+                    timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    else:
+        mcp.run(transport='stdio')